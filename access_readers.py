@@ -0,0 +1,153 @@
+"""
+Pluggable readers for Access (.accdb/.mdb) databases
+Each reader opens a database once and yields tables as DataFrame batches,
+or writes a table straight to CSV. mdb-tools streams one mdb-export process
+per table without going through a shell and is used whenever it's on PATH,
+so the exported CSVs don't depend on which optional packages are installed;
+the pure-Python access-parser backend covers machines without it.
+"""
+
+import shutil
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_BATCH_SIZE = 50_000
+BACKENDS = ['auto', 'access-parser', 'mdb-tools']
+
+
+class AccessReader:
+    """ Base reader: subclasses implement list_tables() and iter_batches()"""
+
+    name = None
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+
+    def list_tables(self):
+        raise NotImplementedError
+
+    def iter_batches(self, table, batch_size=DEFAULT_BATCH_SIZE):
+        raise NotImplementedError
+
+    def export_csv(self, table, output_path, batch_size=DEFAULT_BATCH_SIZE):
+        """ Write a table to CSV batch by batch"""
+        with open(output_path, 'w', newline='') as f:
+            header = True
+            for batch in self.iter_batches(table, batch_size):
+                batch.to_csv(f, index=False, header=header)
+                header = False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class MdbToolsReader(AccessReader):
+    """
+    Streams tables out of mdb-export
+    Batches hold the exported text as-is: no type or NA inference, so codes
+    keep their leading zeros and literal 'NA' stays 'NA'
+    """
+
+    name = 'mdb-tools'
+
+    def list_tables(self):
+        result = subprocess.run(
+            ['mdb-tables', '-1', str(self.db_path)],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return [t.strip() for t in result.stdout.split('\n') if t.strip()]
+
+    def iter_batches(self, table, batch_size=DEFAULT_BATCH_SIZE):
+        proc = subprocess.Popen(
+            ['mdb-export', str(self.db_path), table],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        try:
+            #parse the pipe incrementally rather than buffering the whole table as text
+            for batch in pd.read_csv(proc.stdout, chunksize=batch_size, dtype=str,
+                                     keep_default_na=False, na_filter=False):
+                yield batch
+        except pd.errors.EmptyDataError:
+            pass
+        finally:
+            proc.stdout.close()
+            stderr = proc.stderr.read()
+            proc.stderr.close()
+            returncode = proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, proc.args, stderr=stderr)
+
+    def export_csv(self, table, output_path, batch_size=DEFAULT_BATCH_SIZE):
+        """ mdb-export's output written to disk byte for byte"""
+        with open(output_path, 'wb') as f:
+            result = subprocess.run(['mdb-export', str(self.db_path), table], stdout=f, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args, stderr=result.stderr)
+
+
+def _export_value(value):
+    """ A parsed value in mdb-export's text conventions: booleans as 1/0, dates as MM/DD/YY HH:MM:SS"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.strftime('%m/%d/%y %H:%M:%S')
+    return value
+
+
+class AccessParserReader(AccessReader):
+    """
+    Pure-Python reader: parses the database file once, no subprocesses
+    Values are kept as parsed, without pandas type inference, so an integer
+    column with nulls exports as 1 and an empty field rather than 1.0 and NaN.
+    access-parser only parses whole tables, so each table is held in memory
+    while its batches are yielded; use mdb-tools for tables too large for that
+    """
+
+    name = 'access-parser'
+
+    def __init__(self, db_path):
+        from access_parser import AccessParser
+
+        super().__init__(db_path)
+        self._db = AccessParser(str(self.db_path))
+
+    def list_tables(self):
+        #skip Access system tables
+        return [t for t in self._db.catalog if not t.startswith(('MSys', 'f_'))]
+
+    def iter_batches(self, table, batch_size=DEFAULT_BATCH_SIZE):
+        columns = {col: [_export_value(value) for value in values]
+                   for col, values in self._db.parse_table(table).items()}
+        frame = pd.DataFrame(columns, dtype=object)
+        for start in range(0, len(frame), batch_size):
+            yield frame.iloc[start:start + batch_size]
+
+
+def open_reader(db_path, backend='auto'):
+    """ Open a database with the requested backend ('auto' prefers mdb-tools, then access-parser)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'mdb-tools':
+        return MdbToolsReader(db_path)
+    if backend == 'access-parser':
+        return AccessParserReader(db_path)
+
+    #mdb-export's output is the reference format; access-parser's text still differs in
+    #places (quoting, float digits), so it's only used where mdb-tools isn't installed
+    if shutil.which('mdb-export') is not None:
+        return MdbToolsReader(db_path)
+    return AccessParserReader(db_path)
@@ -0,0 +1,113 @@
+"""
+Enrollment-weighted aggregation for the NYS Education Dashboard
+Precomputes per (YEAR, county) sums so any county selection can be
+combined into weighted or unweighted means without rescanning districts
+"""
+
+import numpy as np
+import pandas as pd
+
+#metric -> column used to weight it
+#rates measured over the cohort are weighted by cohort size, everything else by enrollment
+METRIC_WEIGHTS = {
+    'ATTENDANCE_RATE': 'total_enrollment',
+    'PER_ECDIS': 'total_enrollment',
+    'PER_FREE_LUNCH': 'total_enrollment',
+    'PER_SUSPENSIONS': 'total_enrollment',
+    'PER_WHITE': 'total_enrollment',
+    'PER_BLACK': 'total_enrollment',
+    'PER_HISP': 'total_enrollment',
+    'PER_ASIAN': 'total_enrollment',
+    'PER_ELL': 'total_enrollment',
+    'PER_SWD': 'total_enrollment',
+    'graduation_rate': 'cohort_size',
+    'dropout_rate': 'cohort_size'
+}
+
+GROUP_KEYS = ['YEAR', 'county']
+
+#aggregate entity rows (county label -> counties of their member districts)
+#the NYC aggregate (ENTITY_CD 1) already counts the geographic districts filed under NEW YORK
+AGGREGATE_COUNTIES = {'NYC': ['NEW YORK']}
+
+#partial sums kept for every metric
+CUBE_STATS = ['sum', 'count', 'weighted_sum', 'weight']
+
+
+def weighted_mean(values, weights):
+    """ Weighted mean ignoring rows where the value or weight is missing"""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    valid = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    total = weights[valid].sum()
+    if total == 0:
+        return np.nan
+    return float((values[valid] * weights[valid]).sum() / total)
+
+
+def build_metric_cube(df, metric_weights=METRIC_WEIGHTS, group_keys=GROUP_KEYS):
+    """ Sum, count, weighted sum and weight per metric for every group"""
+    parts = {}
+    for metric, weight_col in metric_weights.items():
+        if metric not in df.columns:
+            continue
+        values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+        if weight_col in df.columns:
+            weights = pd.to_numeric(df[weight_col], errors='coerce').to_numpy(dtype=float)
+        else:
+            weights = np.ones(len(df))
+
+        valid = ~np.isnan(values)
+        weighted = valid & ~np.isnan(weights) & (weights > 0)
+
+        parts[(metric, 'sum')] = np.where(valid, values, 0.0)
+        parts[(metric, 'count')] = valid.astype(float)
+        parts[(metric, 'weighted_sum')] = np.where(weighted, values * weights, 0.0)
+        parts[(metric, 'weight')] = np.where(weighted, weights, 0.0)
+
+    frame = pd.DataFrame(parts, index=df.index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns, names=['metric', 'stat'])
+    keys = [df[key] for key in group_keys]
+    return frame.groupby(keys, dropna=False, observed=True).sum()
+
+
+def _means_from_sums(sums, weighted):
+    """ Turn summed cube stats (metric, stat) into one mean per metric"""
+    sums = sums.unstack('stat')
+    if weighted:
+        numer, denom = sums['weighted_sum'], sums['weight']
+    else:
+        numer, denom = sums['sum'], sums['count']
+    return (numer / denom.where(denom > 0)).astype(float)
+
+
+def counted_counties(counties, aggregate_counties=AGGREGATE_COUNTIES):
+    """ Selected counties minus the member counties of selected aggregates, which they already count"""
+    covered = {member for county in counties for member in aggregate_counties.get(county, [])}
+    return [county for county in counties if county not in covered]
+
+
+def summarize_selection(cube, year, counties, weighted=True):
+    """
+    Combine precomputed groups into metric means for one year and a set of counties
+    Weighted means leave out member districts whose aggregate is in the
+    selection, so those students aren't counted twice
+    """
+    if weighted:
+        counties = counted_counties(counties)
+    years = cube.index.get_level_values('YEAR')
+    county_idx = cube.index.get_level_values('county')
+    selected = cube[(years == year) & county_idx.isin(counties)]
+    return _means_from_sums(selected.sum(), weighted)
+
+
+def cube_to_table(cube):
+    """ Flatten a metric cube into weighted and unweighted means per group"""
+    rows = cube.stack('metric', future_stack=True)
+    table = pd.DataFrame({
+        'mean': rows['sum'] / rows['count'].where(rows['count'] > 0),
+        'weighted_mean': rows['weighted_sum'] / rows['weight'].where(rows['weight'] > 0),
+        'districts': rows['count'].astype(int),
+        'weight': rows['weight']
+    })
+    return table.reset_index()
@@ -3,11 +3,29 @@ NYS Education Performance & Equity Dashboard
 Focus: NYC, Westchester, Nassau, and Suffolk Counties
 """
 
+import io
+import logging
+import os
+
 import streamlit as st 
 import pandas as pd 
+import numpy as np
 import plotly.express as px 
 import plotly.graph_objects as go 
-from pathlib import Path 
+
+from aggregations import build_metric_cube, counted_counties, summarize_selection
+from categorical import read_published_table
+from equity_stats import (
+    MOMENTS_NAME as EQUITY_MOMENTS_NAME,
+    build_pair_moments,
+    correlation_matrix,
+    fit_selection,
+    flag_outliers
+)
+from data_version import VersionChangedError, VersionedLoader, read_manifest, read_published
+from profiling import RerunProfiler, profile_mode
+import shared_frame
+from trend_store import STORE_NAME as TREND_STORE_NAME, TrendStore
 
 #page config
 st.set_page_config(
@@ -16,26 +34,78 @@ st.set_page_config(
     layout="wide"
 )
 
+prof = RerunProfiler(profile_mode())
+logger = logging.getLogger('dashboard')
+
 #load data
-@st.cache_data
-def load_data():
-    data_path = Path('data/processed/master_dataset.csv')
-    df = pd.read_csv(data_path)
+def read_master(version):
+    #verified against this version's manifest so a refresh in progress is never read half-applied,
+    #and newer data is never stored under an older version label;
+    #county and district names come back as categoricals, from Parquet when published
+    df = read_published_table('master_dataset.csv', version=version)
 
     #clean and prep data
     df['YEAR'] = df['YEAR'].astype(int)
 
-    #convert percentage columns to numeric
+    #the pipeline publishes these as numbers; snapshots from before it did can still hold markers like 's'
     pct_col = [col for col in df.columns if col.startswith('PER_')]
-    for col in pct_col:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df['ATTENDANCE_RATE'] = pd.to_numeric(df['ATTENDANCE_RATE'], errors='coerce')
-    df['total_enrollment'] = pd.to_numeric(df['total_enrollment'], errors='coerce')
+    for col in pct_col + ['ATTENDANCE_RATE', 'total_enrollment']:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
 
     return df
 
-df = load_data()
+def load_data(version):
+    if shared_frame.ENABLED:
+        #replicas on this host map one shared copy instead of each parsing their own
+        try:
+            return shared_frame.load_shared(version, lambda: read_master(version))
+        except (ImportError, OSError) as e:
+            #no pyarrow, or the shared dir is full, read-only or owned by someone else
+            logger.warning('Shared frame unavailable (%s), loading data in this process', e)
+    return read_master(version)
+
+@st.cache_resource
+def get_data_loader():
+    #one loader per process; it reloads in the background when the pipeline publishes a new version
+    poll_seconds = float(os.environ.get('DASHBOARD_POLL_SECONDS', 10))
+    return VersionedLoader(load_data, poll_seconds=poll_seconds)
+
+@st.cache_data(max_entries=2)
+def load_metric_cube(version, _df):
+    #per (YEAR, county) sums so metric cards never rescan the districts
+    return build_metric_cube(_df.dropna(subset=['total_enrollment']))
+
+@st.cache_data(max_entries=2)
+def load_trend_store(version, _df):
+    #use the pipeline's store when it was published with this version, otherwise build it
+    manifest = read_manifest()
+    if manifest is not None and manifest['version'] == version and TREND_STORE_NAME in manifest['files']:
+        try:
+            return TrendStore.load(io.BytesIO(read_published(TREND_STORE_NAME, version=version)))
+        except VersionChangedError:
+            pass
+    return TrendStore.build(_df)
+
+@st.cache_data(max_entries=2)
+def load_equity_moments(version, _df):
+    manifest = read_manifest()
+    if manifest is not None and manifest['version'] == version and EQUITY_MOMENTS_NAME in manifest['files']:
+        try:
+            return pd.read_csv(io.BytesIO(read_published(EQUITY_MOMENTS_NAME, version=version)))
+        except VersionChangedError:
+            pass
+    return build_pair_moments(_df)
+
+@st.cache_data(max_entries=64)
+def load_equity_fits(version, year, counties, _moments):
+    return fit_selection(_moments, year, list(counties))
+
+prof.begin('load data')
+data_version, df = get_data_loader().get()
+metric_cube = load_metric_cube(data_version, df)
+trend_store = load_trend_store(data_version, df)
+equity_moments = load_equity_moments(data_version, df)
 
 #title and intro
 st.title("🎓 NYS School District Performance & Equity Dashboard")
@@ -49,17 +119,19 @@ st.sidebar.header("📊 Filters")
 
 #year filter
 years = sorted(df['YEAR'].unique())
-selected_year = st.sidebar.selectbox("Select Year", years, index=len(years)-1)
+selected_year = st.sidebar.selectbox("Select Year", years, index=len(years)-1, key='year')
 
 #county filter
 counties = sorted(df['county'].dropna().unique())
 selected_counties = st.sidebar.multiselect(
     "Select Counties",
     counties,
-    default=counties
+    default=counties,
+    key='counties'
 )
 
 #filter data
+prof.begin('filter')
 df_filtered = df[
     (df['YEAR'] == selected_year) &
     (df['county'].isin(selected_counties))
@@ -69,36 +141,56 @@ df_filtered = df[
 df_filtered = df_filtered.dropna(subset=['total_enrollment'], how='all')
 st.sidebar.markdown(f"**{len(df_filtered)} districts** in selection")
 
+#aggregation toggle
+aggregation = st.sidebar.radio(
+    "Aggregate Metrics By",
+    ["District average", "Student-weighted"],
+    index=0,
+    key='aggregation',
+    help=("Student-weighted averages weight each district by enrollment (cohort size for graduation "
+          "and dropout rates). NEW YORK districts are left out when the NYC aggregate is selected, "
+          "since it already counts their students.")
+)
+weighted = aggregation == "Student-weighted"
+avg_label = "Weighted Avg" if weighted else "Avg"
+selection_means = summarize_selection(metric_cube, selected_year, selected_counties, weighted=weighted)
+if weighted:
+    st.sidebar.caption("Headline metrics are student-weighted, so they can differ a lot from district averages.")
+
 #main metrics section
+prof.begin('metrics')
 st.header("📈 Key Metrics Overview")
 
 col1, col2, col3, col4, col5, col6 = st.columns(6)
 
 with col1:
-    total_students = df_filtered['total_enrollment'].sum()
+    #the NYC aggregate already counts the NEW YORK districts
+    counted = df_filtered['county'].isin(counted_counties(selected_counties))
+    total_students = df_filtered.loc[counted, 'total_enrollment'].sum()
     st.metric("Total Students", f"{total_students:,.0f}")
 
 with col2:
-    avg_attendance = df_filtered['ATTENDANCE_RATE'].mean()
-    st.metric("Avg Attendance Rate", f"{avg_attendance:.1f}%")
+    avg_attendance = selection_means.get('ATTENDANCE_RATE')
+    st.metric(f"{avg_label} Attendance Rate", f"{avg_attendance:.1f}%")
 
 with col3:
-    avg_ecdis = df_filtered['PER_ECDIS'].mean()
-    st.metric("Avg Econ. Disadvantaged", f"{avg_ecdis:.1f}%")
+    avg_ecdis = selection_means.get('PER_ECDIS')
+    st.metric(f"{avg_label} Econ. Disadvantaged", f"{avg_ecdis:.1f}%")
 
 with col4:
-    avg_suspension = df_filtered['PER_SUSPENSIONS'].mean()
-    st.metric("Avg Suspension Rate", f"{avg_suspension:.1f}%")
+    avg_suspension = selection_means.get('PER_SUSPENSIONS')
+    st.metric(f"{avg_label} Suspension Rate", f"{avg_suspension:.1f}%")
 
 with col5:
-    avg_grad = df_filtered['graduation_rate'].mean()
-    st.metric("Avg Graduation Rate", f"{avg_grad:.1f}%")
+    avg_grad = selection_means.get('graduation_rate')
+    st.metric(f"{avg_label} Graduation Rate", f"{avg_grad:.1f}%")
 
 with col6:
-    avg_dropout = df_filtered['dropout_rate'].mean()
-    st.metric("Avg Dropout Rate", f"{avg_dropout:.1f}")
+    avg_dropout = selection_means.get('dropout_rate')
+    st.metric(f"{avg_label} Dropout Rate", f"{avg_dropout:.1f}")
 
 #summary statistics
+prof.begin('summary stats')
 st.header("📊 Summary Statistics")
 
 summary_col1, summary_col2 = st.columns(2)
@@ -176,12 +268,13 @@ with col_export2:
     )
 
 #visualizations
+prof.begin('county charts')
 left_col, right_col = st.columns(2)
 
 with left_col:
     st.subheader("Student Enrollment by County")
 
-    enrollment_by_county = df_filtered.groupby('county')['total_enrollment'].sum().reset_index()
+    enrollment_by_county = df_filtered.groupby('county', observed=True)['total_enrollment'].sum().reset_index()
     enrollment_by_county = enrollment_by_county.sort_values('total_enrollment', ascending=False)
 
     fig = px.bar(
@@ -194,7 +287,7 @@ with left_col:
         color_continuous_scale='Blues'
     )
     fig.update_layout(showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
+    prof.chart(fig, 'enrollment by county', use_container_width=True)
 
 with right_col:
     st.subheader("Demographics Breakdown")
@@ -208,7 +301,7 @@ with right_col:
 
     demo_data = []
     for col, label in demo_cols.items():
-        avg_val = df_filtered[col].mean()
+        avg_val = selection_means.get(col)
         demo_data.append({'Race/Ethnicity': label, 'Percentage': avg_val})
     
     demo_df = pd.DataFrame(demo_data)
@@ -217,53 +310,89 @@ with right_col:
         demo_df,
         values='Percentage',
         names='Race/Ethnicity',
-        title=f'Average Demographics Across Districts ({selected_year})',
+        title=f'{"Student Demographics" if weighted else "Average Demographics Across Districts"} ({selected_year})',
         color_discrete_sequence=px.colors.qualitative.Set3 
     )
-    st.plotly_chart(fig, use_container_width=True)
+    prof.chart(fig, 'demographics', use_container_width=True)
 
 #equity analysis
+prof.begin('equity')
 st.header("⚖️ Equity Analysis")
 
 equity_col1, equity_col2 = st.columns(2)
 
-with equity_col1:
-    st.subheader("Ecomonic Disadvantage vs Attendance")
-    scatter_df = df_filtered[['ENTITY_NAME', 'county', 'PER_ECDIS', 'ATTENDANCE_RATE']].dropna()
+equity_fits = load_equity_fits(data_version, selected_year, tuple(selected_counties), equity_moments)
+
+def equity_scatter(x, y, title, labels):
+    #fitted line and outlier flags come from the precomputed fits, not a refit
+    scatter_df = df_filtered[['ENTITY_NAME', 'county', x, y]].dropna()
+    fit = equity_fits.loc[(x, y)] if (x, y) in equity_fits.index else None
+    has_fit = fit is not None and pd.notna(fit['slope'])
+    if has_fit:
+        scatter_df = flag_outliers(scatter_df, x, y, fit)
 
     fig = px.scatter(
         scatter_df,
-        x='PER_ECDIS',
-        y='ATTENDANCE_RATE',
+        x=x,
+        y=y,
         color='county',
-        hover_data=['ENTITY_NAME'],
-        title='Does Economic Disadvantage Correlate with Attendance?',
-        labels={
+        symbol='vs_trend' if has_fit else None,
+        symbol_map={'Near trend': 'circle', 'Above trend': 'triangle-up', 'Below trend': 'triangle-down'},
+        hover_data=['ENTITY_NAME'] + (['expected'] if has_fit else []),
+        title=title,
+        labels={**labels, 'vs_trend': 'vs. trend', 'expected': 'Expected'}
+    )
+    if has_fit and len(scatter_df) > 0:
+        x_range = np.array([scatter_df[x].min(), scatter_df[x].max()])
+        fig.add_trace(go.Scatter(
+            x=x_range,
+            y=fit['intercept'] + fit['slope'] * x_range,
+            mode='lines',
+            name=f"Trend (r = {fit['r']:.2f})",
+            line=dict(color='gray', dash='dash')
+        ))
+    return fig
+
+with equity_col1:
+    st.subheader("Ecomonic Disadvantage vs Attendance")
+    fig = equity_scatter(
+        'PER_ECDIS',
+        'ATTENDANCE_RATE',
+        'Does Economic Disadvantage Correlate with Attendance?',
+        {
             'PER_ECDIS': 'Economically Disadvantage (%)',
             'ATTENDANCE_RATE': 'Attendance Rate (%)'
         }
     )
-    st.plotly_chart(fig, use_container_width=True)
+    prof.chart(fig, 'ecdis vs attendance', use_container_width=True)
 
 with equity_col2:
     st.subheader("Free Lunch vs. Suspension Rates")
-
-    scatter_df2 = df_filtered[['ENTITY_NAME', 'county', 'PER_FREE_LUNCH', 'PER_SUSPENSIONS']].dropna()
-    fig = px.scatter(
-        scatter_df2,
-        x='PER_FREE_LUNCH',
-        y='PER_SUSPENSIONS',
-        color='county', 
-        hover_data=['ENTITY_NAME'],
-        title='Free Lunch Eligibility vs Suspensions',
-        labels={
+    fig = equity_scatter(
+        'PER_FREE_LUNCH',
+        'PER_SUSPENSIONS',
+        'Free Lunch Eligibility vs Suspensions',
+        {
             'PER_FREE_LUNCH': 'Free Lunch Eligible (%)',
             'PER_SUSPENSIONS': 'Suspension Rate (%)'
         }
     )
-    st.plotly_chart(fig, use_container_width=True)
+    prof.chart(fig, 'free lunch vs suspensions', use_container_width=True)
+
+with st.expander("📐 Correlation Matrix"):
+    corr = correlation_matrix(equity_fits)
+    fig = px.imshow(
+        corr.round(2),
+        text_auto=True,
+        zmin=-1,
+        zmax=1,
+        color_continuous_scale='RdBu',
+        title=f'Correlation Between District Metrics ({selected_year})'
+    )
+    prof.chart(fig, 'correlation matrix', use_container_width=True)
 
 #district comparison
+prof.begin('comparison')
 st.header("🔍 District Comparison Tool")
 
 st.markdown("Select districts to compare side-by-side:")
@@ -273,7 +402,8 @@ district_options = sorted(df_filtered['ENTITY_NAME'].unique())
 selected_districts = st.multiselect(
     "Choose districts to compare",
     district_options,
-    default=district_options[:3] if len(district_options) >=3 else district_options
+    default=district_options[:3] if len(district_options) >=3 else district_options,
+    key='compare_districts'
 )
 
 if selected_districts:
@@ -306,7 +436,7 @@ if selected_districts:
             color='county'
         )
         fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        prof.chart(fig, 'comparison metric 1', use_container_width=True)
 
     with comp_col2:
         metric2 = st.selectbox("Select Metric 2", list(metrics_to_compare.keys()),
@@ -322,7 +452,7 @@ if selected_districts:
             color='county'
         )
         fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        prof.chart(fig, 'comparison metric 2', use_container_width=True)
 
     st.subheader("Detailed Comparison")
     display_cols = ['ENTITY_NAME', 'county'] + list(metrics_to_compare.keys())
@@ -332,72 +462,66 @@ if selected_districts:
         if col in display_df.columns:
             display_df[col] = display_df[col].round(1)
 
-    st.dataframe(display_df, use_container_width=True)
+    prof.dataframe(display_df, 'comparison detail', use_container_width=True)
 
 #trends over time
+prof.begin('trends')
 st.header("📊 Trends Over Time")
 
 #allow user to select districts for trend analysis
 trend_districts = st.multiselect(
     "Select districts to see trends",
     district_options,
-    default=[district_options[0]] if district_options else []
+    default=[district_options[0]] if district_options else [],
+    key='trend_districts'
 )
 
-if trend_districts:
-    trend_df = df[df['ENTITY_NAME'].isin(trend_districts)].copy()
+trend_opt1, trend_opt2 = st.columns(2)
+with trend_opt1:
+    show_yoy = st.checkbox("Show year-over-year change", key='trend_yoy')
+with trend_opt2:
+    show_baseline = st.checkbox("Show county average", key='trend_baseline')
+
+def trend_chart(metric, title, label):
+    #series come straight from the precomputed store, no scan of the full dataset
+    trend_df = trend_store.series(trend_districts, metric, delta=show_yoy).assign(kind='District')
+    if show_baseline:
+        baseline_df = trend_store.baseline(trend_store.counties_of(trend_districts), metric, delta=show_yoy)
+        trend_df = pd.concat([trend_df, baseline_df.assign(kind='County average')], ignore_index=True)
+
+    return px.line(
+        trend_df,
+        x='YEAR',
+        y='value',
+        color='ENTITY_NAME',
+        line_dash='kind',
+        title=f'{title} {"Change" if show_yoy else "Trend"}',
+        labels={'value': f'{label} (YoY change)' if show_yoy else label, 'YEAR': 'Year',
+                'ENTITY_NAME': 'District', 'kind': ''},
+        markers=True
+    )
 
+if trend_districts:
     trend_col1, trend_col2, trend_col3, trend_col4 = st.columns(4)
 
     with trend_col1:
-        fig = px.line(
-            trend_df,
-            x='YEAR',
-            y='ATTENDANCE_RATE',
-            color='ENTITY_NAME',
-            title='Attendance Rate Trend',
-            labels={'ATTENDANCE_RATE': 'Attendance Rate (%)', 'YEAR': 'Year'},
-            markers=True
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = trend_chart('ATTENDANCE_RATE', 'Attendance Rate', 'Attendance Rate (%)')
+        prof.chart(fig, 'attendance trend', use_container_width=True)
 
     with trend_col2:
-        fig = px.line(
-            trend_df,
-            x='YEAR',
-            y='total_enrollment',
-            color='ENTITY_NAME',
-            title='Enrollment Trend',
-            labels={'total_enrollemnt': 'Total Enrollment', 'YEAR': 'Year'},
-            markers=True
-        )
-        st.plotly_chart(fig, use_container_width=True)
-    
+        fig = trend_chart('total_enrollment', 'Enrollment', 'Total Enrollment')
+        prof.chart(fig, 'enrollment trend', use_container_width=True)
+
     with trend_col3:
-        fig = px.line(
-            trend_df,
-            x='YEAR',
-            y='graduation_rate',
-            color='ENTITY_NAME',
-            title='Graduation Rate Trend',
-            labels={'graduation_rate': 'Graduation Rate (%)', 'YEAR': 'Year'},
-            markers=True 
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = trend_chart('graduation_rate', 'Graduation Rate', 'Graduation Rate (%)')
+        prof.chart(fig, 'graduation trend', use_container_width=True)
 
     with trend_col4:
-        fig = px.line(
-            trend_df,
-            x='YEAR',
-            y='dropout_rate',
-            color='ENTITY_NAME',
-            title='Dropout Rate Trend',
-            labels={'dropout_rate': 'Dropout Rate (%)', 'YEAR': 'Year'},
-            markers=True 
-        )
-        st.plotly_chart(fig, use_container_width=True) 
+        fig = trend_chart('dropout_rate', 'Dropout Rate', 'Dropout Rate (%)')
+        prof.chart(fig, 'dropout trend', use_container_width=True)
 
 #data explorer
+prof.begin('data explorer')
 with st.expander("🔍 Explore Raw Data"):
     st.subheader("Filtered Dataset")
     st.markdown(f"Showing {len(df_filtered)} districts for {selected_year}")
@@ -413,13 +537,18 @@ with st.expander("🔍 Explore Raw Data"):
     )
 
     if selected_cols:
-        st.dataframe(df_filtered[selected_cols], use_container_width=True)
+        prof.dataframe(df_filtered[selected_cols], 'raw data', use_container_width=True)
 
 #footer
+prof.begin('footer')
 st.markdown("---")
+manifest = read_manifest()
+if manifest is not None and manifest['version'] == data_version:
+    st.caption(f"Data version {data_version}, built {manifest['built_at']}")
 st.markdown("""
 **Data Source:** New York State Education Department (data.nysed.gov)
 **Years Covered:** 2022-2024
 **Regions:** NYC, Westchester, Nassau, and Suffolk Counties
  """)
 
+prof.finish()
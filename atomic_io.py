@@ -0,0 +1,116 @@
+"""
+Crash-safe output writing for the data pipeline
+Every file is written to a temp file and renamed into place. Pipeline runs
+stage all of their outputs first and promote them together. The run is
+committed once its manifest is written into staging; promotion then moves
+the files and finally the manifest into place, and is finished by the next
+run if it is interrupted.
+"""
+
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+from data_version import MANIFEST_NAME, file_hash, read_manifest, write_manifest
+
+STAGING_NAME = '.staging'
+
+
+@contextmanager
+def atomic_path(path):
+    """ Yield a temp path next to `path`; rename it into place only if the block succeeds"""
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def write_csv_atomic(df, path, **kwargs):
+    """ DataFrame.to_csv that never leaves a half-written file behind"""
+    kwargs.setdefault('index', False)
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, **kwargs)
+
+
+class StagedOutput:
+    """
+    Collects one pipeline run's outputs in a staging directory
+    Nothing in the output directory changes until commit(), which writes the
+    manifest into staging, renames each staged file into place and then
+    publishes the manifest. A run that fails before commit leaves the previous
+    outputs untouched; one that dies while promoting is completed by the next
+    StagedOutput on the same directory, so mixed outputs never outlive it.
+    """
+
+    def __init__(self, output_dir, manifest_name=MANIFEST_NAME):
+        self.output_dir = Path(output_dir)
+        self.manifest_name = manifest_name
+        self.staging_dir = self.output_dir / f'{STAGING_NAME}-{Path(manifest_name).stem}'
+        self.files = []
+        self.kept = []
+
+        #a staged manifest means that run had committed and was promoting, so finish it
+        if (self.staging_dir / manifest_name).exists():
+            self._promote(read_manifest(self.staging_dir, manifest_name))
+        #any other leftovers were never committed, so they're safe to drop
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir)
+        self.staging_dir.mkdir(parents=True)
+
+    def path(self, name):
+        """ Staging path for an output file, recorded for promotion at commit"""
+        if name not in self.files:
+            self.files.append(name)
+        return self.staging_dir / name
+
+    def keep(self, names):
+        """ Carry already-published files into the new manifest without restaging them"""
+        for name in names:
+            if name not in self.kept:
+                self.kept.append(name)
+
+    def write_csv(self, df, name, **kwargs):
+        kwargs.setdefault('index', False)
+        df.to_csv(self.path(name), **kwargs)
+
+    def commit(self):
+        """ Promote staged files and publish the manifest; returns the manifest"""
+        staged = [name for name in self.files if (self.staging_dir / name).exists()]
+        kept = [name for name in self.kept if name not in staged and (self.output_dir / name).exists()]
+        for name in staged:
+            with open(self.staging_dir / name, 'rb') as f:
+                os.fsync(f.fileno())
+        hashes = {name: file_hash(self.staging_dir / name) for name in staged}
+        hashes.update({name: file_hash(self.output_dir / name) for name in kept})
+        #the staged manifest is the commit point, promotion can be redone from it after a crash
+        manifest = write_manifest(self.staging_dir, staged + kept, manifest_name=self.manifest_name, hashes=hashes)
+        self._promote(manifest)
+        return manifest
+
+    def _promote(self, manifest):
+        """ Rename the manifest's staged files into place, then the manifest itself"""
+        for name in manifest['files']:
+            if (self.staging_dir / name).exists():
+                os.replace(self.staging_dir / name, self.output_dir / name)
+        os.replace(self.staging_dir / self.manifest_name, self.output_dir / self.manifest_name)
+        shutil.rmtree(self.staging_dir)
+
+    def abort(self):
+        #once the manifest is staged the run is committed; leave it for the next run to finish
+        if not (self.staging_dir / self.manifest_name).exists():
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
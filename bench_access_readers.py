@@ -0,0 +1,132 @@
+"""
+Benchmark the Access reader backends against each other
+Exports every table of each database to CSV with each available backend,
+the same export_csv path the exporter uses, and reports wall time and
+rows/sec. Memory is measured in a separate run in a fresh process, so
+tracking it never slows the timed run: peak RSS of the exporting process
+and of its largest mdb-export child (sampled from /proc, so Linux only).
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from access_readers import DEFAULT_BATCH_SIZE, open_reader
+
+DATA_DIR = Path('data/raw')
+DATABASES = ['ENROLL2024_20241105.accdb', 'STUDED_2024.accdb', '2024_GRADUATION_RATE.mdb']
+BENCH_BACKENDS = ['mdb-tools', 'access-parser']
+
+
+def _export_tables(db_path, backend, batch_size, max_tables, out_dir):
+    """ Export a database's tables into out_dir; returns the CSV paths"""
+    paths = []
+    with open_reader(db_path, backend) as reader:
+        for i, table in enumerate(reader.list_tables()[:max_tables]):
+            path = Path(out_dir) / f'{i}.csv'
+            reader.export_csv(table, path, batch_size)
+            paths.append(path)
+    return paths
+
+
+def _count_rows(path):
+    with open(path, newline='') as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def _sample_children(pid, peaks, stop, interval=0.01):
+    """ Record the VmHWM (KB) of pid's child processes until stop is set"""
+    #RUSAGE_CHILDREN would report the parent's size, which a child inherits at fork
+    while not stop.wait(interval):
+        for status in Path('/proc').glob('[0-9]*/status'):
+            try:
+                fields = dict(line.split(':', 1) for line in status.read_text().splitlines())
+            except (OSError, ValueError):
+                continue
+            if int(fields['PPid']) == pid and 'VmHWM' in fields:
+                peaks[status.parent.name] = int(fields['VmHWM'].split()[0])
+
+
+def _peak_memory(db_path, backend, batch_size, max_tables):
+    """ Run in a fresh process: peak RSS in MB of the process and of its largest child"""
+    peaks, stop = {}, threading.Event()
+    sampler = threading.Thread(target=_sample_children, args=(os.getpid(), peaks, stop), daemon=True)
+    sampler.start()
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            _export_tables(db_path, backend, batch_size, max_tables, out_dir)
+    finally:
+        stop.set()
+        sampler.join()
+    #ru_maxrss is in KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return own / 1e3, max(peaks.values(), default=0) / 1e3
+
+
+def bench_backend(db_path, backend, batch_size=DEFAULT_BATCH_SIZE, max_tables=None):
+    """ Time exporting a database's tables with one backend, then measure its memory in a second run"""
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        paths = _export_tables(db_path, backend, batch_size, max_tables, out_dir)
+        elapsed = time.perf_counter() - start
+        #rows are counted after the clock stops
+        rows = sum(_count_rows(path) for path in paths)
+
+    #spawn rather than fork so the child's peak RSS starts from a clean interpreter
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        peak_mb, child_peak_mb = pool.apply(_peak_memory, (db_path, backend, batch_size, max_tables))
+
+    return {
+        'database': db_path.name,
+        'backend': backend,
+        'tables': len(paths),
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_sec': round(rows / elapsed) if elapsed > 0 else None,
+        'peak_mb': round(peak_mb, 1),
+        'child_peak_mb': round(child_peak_mb, 1)
+    }
+
+
+def run(db_paths, backends=BENCH_BACKENDS, batch_size=DEFAULT_BATCH_SIZE, max_tables=None):
+    results = []
+    for db_path in db_paths:
+        if not db_path.exists():
+            print(f"Not found: {db_path}")
+            continue
+        for backend in backends:
+            try:
+                result = bench_backend(db_path, backend, batch_size, max_tables)
+            except Exception as e:
+                print(f"{backend} unavailable for {db_path.name}: {e}")
+                continue
+            print(f"{result['database']:<30} {backend:<14} {result['rows']:>10,} rows "
+                  f"{result['seconds']:>8}s {result['peak_mb']:>8} MB {result['child_peak_mb']:>8} MB child")
+            results.append(result)
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('databases', nargs='*', type=Path,
+                        default=[DATA_DIR / name for name in DATABASES])
+    parser.add_argument('--backend', action='append', choices=BENCH_BACKENDS,
+                        help='backend to benchmark (repeatable, default: all)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-tables', type=int, default=None)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("ACCESS READER BENCHMARK")
+    print("="*70)
+    results = run(args.databases, args.backend or BENCH_BACKENDS, args.batch_size, args.max_tables)
+    if len(results) > 0:
+        print("\n" + results.to_string(index=False))
@@ -0,0 +1,85 @@
+"""
+Dictionary-encoded name columns for the processed tables
+County, district and subgroup names repeat on every row. As pandas
+categoricals each distinct string is stored once with small integer codes
+per row, and isin/groupby compare codes instead of strings. Columns holding
+the same kind of name share one dictionary across every table, so codes line
+up between tables and survive the round trip through Parquet.
+"""
+
+import io
+from pathlib import Path
+
+import pandas as pd
+
+from data_version import PROCESSED_DIR, read_manifest, read_published
+
+#column -> dictionary it shares with other columns of the same kind
+CATEGORICAL_COLUMNS = {
+    'county': 'county',
+    'COUNTY_NAME': 'county',
+    'county_name': 'county',
+    'ENTITY_NAME': 'district',
+    'DISTRICT_NAME': 'district',
+    'lea_name': 'lea',
+    'subgroup_name': 'subgroup'
+}
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def build_dictionaries(tables, columns=CATEGORICAL_COLUMNS):
+    """ Sorted distinct values per dictionary, pooled over every table"""
+    values = {}
+    for df in tables.values():
+        for col, dictionary in columns.items():
+            if col in df.columns and (_is_text(df[col]) or isinstance(df[col].dtype, pd.CategoricalDtype)):
+                values.setdefault(dictionary, set()).update(df[col].dropna().astype(str).unique())
+    return {dictionary: sorted(names) for dictionary, names in values.items()}
+
+
+def encode_frame(df, dictionaries=None, columns=CATEGORICAL_COLUMNS):
+    """ Copy of df with its name columns as categoricals, using the shared dictionaries when given"""
+    encoded = {}
+    for col, dictionary in columns.items():
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype) or not _is_text(df[col]):
+            continue
+        if dictionaries is not None and dictionary in dictionaries:
+            categories = dictionaries[dictionary]
+        else:
+            categories = sorted(df[col].dropna().astype(str).unique())
+        encoded[col] = pd.Categorical(df[col], categories=categories)
+    return df.assign(**encoded) if encoded else df
+
+
+def encode_tables(tables, columns=CATEGORICAL_COLUMNS):
+    """ Encode every table against dictionaries shared across all of them"""
+    dictionaries = build_dictionaries(tables, columns)
+    return {name: encode_frame(df, dictionaries, columns) for name, df in tables.items()}
+
+
+def parquet_name(name):
+    return Path(name).with_suffix('.parquet').name
+
+
+def write_parquet(df, path):
+    """ Parquet keeps categoricals dictionary-encoded on disk and restores them on read; needs pyarrow"""
+    df.to_parquet(path, index=False)
+
+
+def read_published_table(name, output_dir=PROCESSED_DIR, version=None):
+    """
+    A published CSV table, read from its Parquet copy when this version has one
+    Either way the name columns come back as categoricals. With `version` the
+    table must come from that data version (see read_published)
+    """
+    manifest = read_manifest(output_dir)
+    parquet = parquet_name(name)
+    if manifest is not None and parquet in manifest['files']:
+        try:
+            return pd.read_parquet(io.BytesIO(read_published(parquet, output_dir, version=version)))
+        except ImportError:
+            pass
+    return encode_frame(pd.read_csv(io.BytesIO(read_published(name, output_dir, version=version)), low_memory=False))
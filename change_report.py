@@ -0,0 +1,139 @@
+"""
+Change-data report between pipeline runs
+Each table is compared with the previously published snapshot on
+(ENTITY_CD, YEAR): rows are aligned on the key once and every column is
+compared in a single vectorized pass. The report has one line per added or
+removed row and one per changed cell, with old and new values and the
+numeric delta. The (YEAR, county) groups the changes touch let per-group
+aggregates be patched instead of rebuilt.
+"""
+
+import numpy as np
+import pandas as pd
+
+from categorical import read_published_table
+from data_version import PROCESSED_DIR, read_manifest
+
+KEY_COLUMNS = ['ENTITY_CD', 'YEAR']
+GROUP_KEYS = ['YEAR', 'county']
+REPORT_NAME = 'change_report.csv'
+REPORT_COLUMNS = ['table', 'change', 'ENTITY_CD', 'YEAR', 'column', 'old', 'new', 'delta']
+
+
+def _keyed(df, keys):
+    """ Frame indexed by the key, plain values instead of categoricals"""
+    df = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    #repeated keys are told apart by their order of appearance
+    occurrence = df.groupby(keys, dropna=False, sort=False).cumcount()
+    return df.assign(_occurrence=occurrence.to_numpy()).set_index(keys + ['_occurrence'])
+
+
+def _key_rows(table, change, index, keys):
+    rows = index.to_frame(index=False)[keys]
+    return rows.assign(table=table, change=change)
+
+
+def diff_table(old, new, table, keys=KEY_COLUMNS):
+    """ Added, removed and changed rows of one table as report lines"""
+    old_keyed, new_keyed = _keyed(old, keys), _keyed(new, keys)
+    added = new_keyed.index.difference(old_keyed.index)
+    removed = old_keyed.index.difference(new_keyed.index)
+    common = new_keyed.index.intersection(old_keyed.index)
+
+    columns = [col for col in new_keyed.columns if col in old_keyed.columns]
+    before = old_keyed.loc[common, columns]
+    after = new_keyed.loc[common, columns]
+
+    numeric = np.array([pd.api.types.is_numeric_dtype(before[col]) and pd.api.types.is_numeric_dtype(after[col])
+                        for col in columns], dtype=bool)
+    #missing values become None so they compare equal to each other and unequal to anything else
+    old_values = before.astype(object).where(before.notna(), None).to_numpy(dtype=object)
+    new_values = after.astype(object).where(after.notna(), None).to_numpy(dtype=object)
+    changed = old_values != new_values
+
+    #numbers compare as floats, so 5 and 5.0 from a CSV round trip are equal
+    num_cols = np.flatnonzero(numeric)
+    old_num = before.iloc[:, num_cols].to_numpy(dtype=float)
+    new_num = after.iloc[:, num_cols].to_numpy(dtype=float)
+    changed[:, num_cols] = ~((old_num == new_num) | (np.isnan(old_num) & np.isnan(new_num)))
+    deltas = np.full(changed.shape, np.nan)
+    deltas[:, num_cols] = new_num - old_num
+
+    rows, cols = np.nonzero(changed)
+    changes = common[rows].to_frame(index=False)[keys].assign(
+        table=table,
+        change='changed',
+        column=np.array(columns, dtype=object)[cols],
+        old=old_values[rows, cols],
+        new=new_values[rows, cols],
+        delta=deltas[rows, cols]
+    )
+    parts = [_key_rows(table, 'added', added, keys), _key_rows(table, 'removed', removed, keys), changes]
+    return pd.concat([part for part in parts if len(part) > 0] or [pd.DataFrame(columns=REPORT_COLUMNS)],
+                     ignore_index=True).reindex(columns=REPORT_COLUMNS)
+
+
+def keyed_names(tables, keys=KEY_COLUMNS):
+    """ Names of the tables that carry the key, the only ones a report can cover"""
+    return [name for name, df in tables.items() if all(key in df.columns for key in keys)]
+
+
+def diff_tables(previous, tables, keys=KEY_COLUMNS):
+    """ Report for every table that has the key and a previous snapshot"""
+    reports = [diff_table(previous[name], df, name, keys) for name, df in tables.items()
+               if name in previous and all(key in df.columns and key in previous[name].columns for key in keys)]
+    reports = [report for report in reports if len(report) > 0]
+    if not reports:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index=True)
+
+
+def summarize_changes(report):
+    """ Rows added/removed/changed and cells changed, per table"""
+    changed = report[report['change'] == 'changed']
+    summary = pd.DataFrame({
+        'added': report[report['change'] == 'added'].groupby('table').size(),
+        'removed': report[report['change'] == 'removed'].groupby('table').size(),
+        'changed_rows': changed.drop_duplicates(['table', 'ENTITY_CD', 'YEAR']).groupby('table').size(),
+        'changed_cells': changed.groupby('table').size()
+    })
+    return summary.fillna(0).astype(int)
+
+
+def read_previous(names, output_dir=PROCESSED_DIR):
+    """ The published snapshot of each named table that the current data version has"""
+    manifest = read_manifest(output_dir)
+    if manifest is None:
+        return {}
+    return {name: read_published_table(name, output_dir) for name in names if name in manifest['files']}
+
+
+def affected_groups(old_master, new_master, report, table, keys=KEY_COLUMNS, group_keys=GROUP_KEYS):
+    """
+    (YEAR, county) groups holding any added, removed or changed master row,
+    on either side of the change. None when the master's columns changed,
+    since then every group has to be rebuilt.
+    """
+    if old_master is None or set(old_master.columns) != set(new_master.columns):
+        return None
+    touched = report.loc[report['table'] == table, keys].drop_duplicates()
+    groups = [df.merge(touched, on=keys)[group_keys] for df in (old_master, new_master)]
+    groups = pd.concat([g.astype({'county': str}) for g in groups], ignore_index=True)
+    return groups.drop_duplicates().reset_index(drop=True)
+
+
+def patch_groups(previous, master, groups, build_fn, group_keys=GROUP_KEYS):
+    """ A per-group table with only the given groups rebuilt from the master"""
+    def in_groups(df):
+        index = pd.MultiIndex.from_frame(df[group_keys].astype({'county': str}))
+        return index.isin(pd.MultiIndex.from_frame(groups[group_keys]))
+
+    kept = previous[~in_groups(previous)].astype({'county': str})
+    changed = master[in_groups(master)]
+    if len(changed) == 0:
+        #only removed groups, nothing to rebuild
+        return kept.reset_index(drop=True)
+    rebuilt = build_fn(changed).astype({'county': str})
+    patched = pd.concat([kept, rebuilt], ignore_index=True)
+    #stable sort keeps each group's rows in the order a full build produces
+    return patched.sort_values(group_keys, kind='stable').reset_index(drop=True)
@@ -3,236 +3,432 @@ Data Processing Pipeline for NYS Education Dashboard
 Filters and merges data for NYC, Westchester, Nassau, and Suffolk counties
 """
 
-import pandas as pd 
-from pathlib import Path 
-import numpy as np 
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pathlib import Path
+import numpy as np
+
+from aggregations import build_metric_cube, cube_to_table
+from atomic_io import StagedOutput, write_csv_atomic
+from categorical import encode_tables, parquet_name, write_parquet
+from change_report import (
+    REPORT_NAME as CHANGE_REPORT_NAME,
+    affected_groups,
+    diff_tables,
+    keyed_names,
+    patch_groups,
+    read_previous,
+    summarize_changes
+)
+from district_matching import build_crosswalk
+from equity_stats import MOMENTS_NAME as EQUITY_MOMENTS_NAME, build_pair_moments
+from trend_store import STORE_NAME as TREND_STORE_NAME, TrendStore
+from validation import ValidationError, run_validation
 
 #paths
 RAW_DIR = Path('data/raw')
 PROCESSED_DIR = Path('data/processed')
 OUTPUT_DIR = Path('data/processed')
-OUTPUT_DIR.mkdir(exist_ok=True)
+CROSSWALK_OVERRIDES = Path('data/reference/district_crosswalk_overrides.csv')
 
 #target counties
 TARGET_COUNTIES = ['NEW YORK', 'WESTCHESTER', 'NASSAU', 'SUFFOLK']
 
-print("="*70)
-print("NYS EDUCATION DATA PROCESSING PIPELINE")
-print("="*70)
+#exported tables this pipeline reads; the STUDED and graduation ones are optional
+SOURCE_FILES = {
+    'boces': 'ENROLL_BOCES_and_N_RC.csv',
+    'enrollment': 'ENROLL_BEDS_Day_Enrollment.csv',
+    'demographics': 'ENROLL_Demographic_Factors.csv'
+}
+STUDED_FILES = {
+    'attendance': 'STUDED_Attendance.csv',
+    'class_size': 'STUDED_Average_Class_Size.csv',
+    'lunch': 'STUDED_Free_Reduced_Price_Lunch.csv',
+    'suspensions': 'STUDED_Suspensions.csv',
+    'staff': 'STUDED_Staff.csv'
+}
+GRAD_FILE = 'GRAD_GRAD_RATE_AND_OUTCOMES_2024.csv'
+
+MASTER_NAME = 'master_dataset.csv'
+CROSSWALK_NAME = 'district_crosswalk.csv'
+#tables also published as Parquet, which keeps their name columns dictionary-encoded
+PARQUET_TABLES = [MASTER_NAME, 'grad_filtered.csv', 'graducation_all_students.csv']
+METRICS_NAME = 'metrics_by_year_county.csv'
+#aggregates with one independent block of rows per (YEAR, county), so they can be patched group by group
+GROUPED_AGGREGATES = {
+    #precompute weighted and unweighted metrics per (YEAR, county)
+    METRICS_NAME: lambda df: cube_to_table(build_metric_cube(df)),
+    #pairwise moments behind the equity scatter trend lines
+    EQUITY_MOMENTS_NAME: build_pair_moments
+}
 
-#Loading and filtering county/district mapping
-print("\n[1/7] Loading district-county mappings...")
 
-boces_df = pd.read_csv(PROCESSED_DIR / 'ENROLL_BOCES_and_N_RC.csv')
-#get unique district in target counties
-target_districts = boces_df[
-    boces_df['COUNTY_NAME'].isin(TARGET_COUNTIES)
-][['DISTRICT_CD', 'DISTRICT_NAME', 'COUNTY_NAME']].drop_duplicates()
+class EmptySelectionError(ValueError):
+    """ The selected counties and years match no enrollment records"""
 
-print(f" Found {len(target_districts)} districts across target counties:")
-for county in TARGET_COUNTIES:
-    count = len(target_districts[target_districts['COUNTY_NAME'] == county])
-    print(f" -{county}: {count} districts")
 
-#save district mapping
-target_districts.to_csv(OUTPUT_DIR / 'target_districts.csv', index=False)
+def read_sources(processed_dir=PROCESSED_DIR, jobs=1):
+    """ Read every exported table the pipeline needs, jobs files at a time"""
+    processed_dir = Path(processed_dir)
+    files = {**SOURCE_FILES, **STUDED_FILES, 'grad': GRAD_FILE}
 
-# loading and filtering enrollment data
-print("\n[2/7] Processing enrollment data...")
+    def read(item):
+        name, filename = item
+        path = processed_dir / filename
+        if name not in SOURCE_FILES and not path.exists():
+            return name, None
+        return name, pd.read_csv(path, low_memory=False)
 
-enrollment_df = pd.read_csv(PROCESSED_DIR / 'ENROLL_BEDS_Day_Enrollment.csv')
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        return dict(pool.map(read, files.items()))
 
-#filter for districts 
-district_codes = target_districts['DISTRICT_CD'].dropna().astype(str).unique()
 
-#for enrollments we'll need to filter based on ENTITY_NAME matching district names
-enrollment_filtered = enrollment_df[
-    enrollment_df['ENTITY_NAME'].isin(target_districts['DISTRICT_NAME']) |
-    (enrollment_df['ENTITY_CD'] == 1) #includes NYC aggregate
-]
-print(f" Filtered to {len(enrollment_filtered)} enrollment records")
-enrollment_filtered.to_csv(OUTPUT_DIR / 'enrollment_filtered.csv', index=False)
+def _select_years(df, years):
+    if years and 'YEAR' in df.columns:
+        return df[df['YEAR'].isin(years)]
+    return df
 
-#loading and filtering demographics
-print("\n[3/7] Processing demographic data...")
 
-demographics_df = pd.read_csv(PROCESSED_DIR / 'ENROLL_Demographic_Factors.csv')
-demographics_filtered = demographics_df[
-    demographics_df['ENTITY_NAME'].isin(target_districts['DISTRICT_NAME']) |
-    (demographics_df['ENTITY_CD'] == 1)
-]
-print(f" Filtered to {len(demographics_filtered)} demographics records")
-demographics_filtered.to_csv(OUTPUT_DIR / 'demographics_filtered.csv', index=False)
+def build_tables(sources, counties=TARGET_COUNTIES, years=None, output_dir=OUTPUT_DIR,
+                 overrides_path=CROSSWALK_OVERRIDES):
+    """
+    Filter the exported tables to the selected counties and years and build the master dataset
+    Returns (tables, validation_inputs); the master is tables['master_dataset.csv']
+    """
+    #outputs are collected here, validated together, then staged and promoted in one commit
+    tables = {}
+    validation_inputs = {}
+    #the NYC aggregate rows come along with New York county
+    include_nyc = 'NEW YORK' in counties
 
-#loading and filtering STUDED metrics
-print('\n[4/7] Processing STUDED metrics...')
+    #Loading and filtering county/district mapping
+    print("\n[1/7] Loading district-county mappings...")
 
-studed_files = {
-    'attendance': 'STUDED_Attendance.csv',
-    'class_size': 'STUDED_Average_Class_Size.csv',
-    'lunch': 'STUDED_Free_Reduced_Price_Lunch.csv',
-    'suspensions': 'STUDED_Suspensions.csv',
-    'staff': 'STUDED_Staff.csv'
-}
-filtered_studed = {}
+    boces_df = sources['boces']
+    #get unique district in target counties
+    target_districts = boces_df[
+        boces_df['COUNTY_NAME'].isin(counties)
+    ][['DISTRICT_CD', 'DISTRICT_NAME', 'COUNTY_NAME']].drop_duplicates()
+
+    print(f" Found {len(target_districts)} districts across target counties:")
+    for county in counties:
+        count = len(target_districts[target_districts['COUNTY_NAME'] == county])
+        print(f" -{county}: {count} districts")
+
+    #save district mapping
+    tables['target_districts.csv'] = target_districts
+
+    # loading and filtering enrollment data
+    print("\n[2/7] Processing enrollment data...")
+
+    enrollment_df = _select_years(sources['enrollment'], years)
+
+    #for enrollments we'll need to filter based on ENTITY_NAME matching district names
+    enrollment_filtered = enrollment_df[
+        enrollment_df['ENTITY_NAME'].isin(target_districts['DISTRICT_NAME']) |
+        ((enrollment_df['ENTITY_CD'] == 1) & include_nyc) #includes NYC aggregate
+    ]
+    print(f" Filtered to {len(enrollment_filtered)} enrollment records")
+    tables['enrollment_filtered.csv'] = enrollment_filtered
 
-for name, filename in studed_files.items():
-    file_path = PROCESSED_DIR / filename 
-    if file_path.exists():
-        df = pd.read_csv(file_path)
+    #loading and filtering demographics
+    print("\n[3/7] Processing demographic data...")
+
+    demographics_df = _select_years(sources['demographics'], years)
+    demographics_filtered = demographics_df[
+        demographics_df['ENTITY_NAME'].isin(target_districts['DISTRICT_NAME']) |
+        ((demographics_df['ENTITY_CD'] == 1) & include_nyc)
+    ]
+    print(f" Filtered to {len(demographics_filtered)} demographics records")
+    tables['demographics_filtered.csv'] = demographics_filtered
+
+    #loading and filtering STUDED metrics
+    print('\n[4/7] Processing STUDED metrics...')
+
+    filtered_studed = {}
+    for name in STUDED_FILES:
+        df = sources.get(name)
+        if df is None:
+            continue
+        df = _select_years(df, years)
 
         if 'ENTITY_NAME' in df.columns:
             filtered = df[
                 df['ENTITY_NAME'].isin(target_districts['DISTRICT_NAME']) |
-                (df['ENTITY_CD'] == 1)
+                ((df['ENTITY_CD'] == 1) & include_nyc)
             ]
         elif 'DISTRICT_NAME' in df.columns:
             filtered = df[df['DISTRICT_NAME'].isin(target_districts['DISTRICT_NAME'])]
         else:
-            filtered = df 
-        filtered_studed[name] = filtered 
-        output_file = OUTPUT_DIR / f'{name}_filtered.csv'
-        filtered.to_csv(output_file, index=False)
+            filtered = df
+        filtered_studed[name] = filtered
+        tables[f'{name}_filtered.csv'] = filtered
         print(f" -{name}: {len(filtered)} records")
 
-#load and filter graduation data
-print("\n[6/7] Processing graduation data...")
-grad_file = PROCESSED_DIR / 'GRAD_GRAD_RATE_AND_OUTCOMES_2024.csv'
-if grad_file.exists():
-    grad_df = pd.read_csv(grad_file, low_memory=False)
-
-    #filter for target counties
-    grad_filtered = grad_df[
-        grad_df['county_name'].isin(TARGET_COUNTIES) |
-        (grad_df['nyc_ind'] == 1)
-    ].copy()
-    
-    pct_cols = ['grad_pct', 'dropout_pct', 'still_enr_pct', 'ged_pct',
-                'local_pct', 'reg_pct', 'reg_adv_pct']
-    
-    for col in pct_cols:
-        if col in grad_filtered.columns:
-            grad_filtered[col] = grad_filtered[col].astype(str).str.replace("%", "").str.strip()
-            grad_filtered[col] = pd.to_numeric(grad_filtered[col], errors='coerce')
-
-    #filter for "all students" subgroup for main metrics
-    grad_all_students = grad_filtered[grad_filtered['subgroup_name'] == 'All Students'].copy()
-    print(f" Filtered to {len(grad_filtered)} total graduation records")
-    print(f" 'All Students' records: {len(grad_all_students)}")
-
-    #save filtered graduation data
-    grad_filtered.to_csv(OUTPUT_DIR / 'grad_filtered.csv', index=False)
-    grad_all_students.to_csv(OUTPUT_DIR / 'graducation_all_students.csv', index=False)
-else:
-    print(f" Graduation file not found")
-    grad_all_students = None
-
-#creating master dataset by joining key metrics
-print("\n[7/7] Creating master dataset...")
-
-master = enrollment_filtered[['ENTITY_CD', 'ENTITY_NAME', 'YEAR', 'K12']].copy()
-master = master.rename(columns={'K12': 'total_enrollment'})
-
-demo_cols = ['ENTITY_CD', 'YEAR', 'PER_ECDIS', 'PER_BLACK', 'PER_HISP',
-            'PER_WHITE', 'PER_ASIAN', 'PER_ELL', 'PER_SWD']
-if all(col in demographics_filtered.columns for col in demo_cols):
-    master = master.merge(
-        demographics_filtered[demo_cols],
-        on=['ENTITY_CD', 'YEAR'],
-        how='left'
-    )
-if 'lunch' in filtered_studed:
-    lunch = filtered_studed['lunch'][['ENTITY_CD', 'YEAR', 'PER_FREE_LUNCH', 'PER_REDUCED_LUNCH']]
-    master = master.merge(lunch, on=['ENTITY_CD', 'YEAR'], how='left')
-
-if 'attendance' in filtered_studed:
-    attendance = filtered_studed['attendance'][['ENTITY_CD', 'YEAR', 'ATTENDANCE_RATE']]
-    master = master.merge(attendance, on=['ENTITY_CD', 'YEAR'], how='left')
-
-if 'suspensions' in filtered_studed:
-    suspensions = filtered_studed['suspensions'][['ENTITY_CD', 'YEAR', 'PER_SUSPENSIONS']]
-    master = master.merge(suspensions, on=['ENTITY_CD', 'YEAR'], how='left')
-
-#add county info from above mapping
-entity_to_county = target_districts.set_index('DISTRICT_NAME')['COUNTY_NAME'].to_dict()
-master['county'] = master['ENTITY_NAME'].map(entity_to_county)
-master['county'] = master['county'].fillna('NYC')
-
-#adding graduation data if available
-if grad_all_students is not None:
-    def standardize_district_name(name):
-        if pd.isna(name):
-            return name
-        name = str(name).upper()
-        replacements = {
-            ' UNION FREE SCHOOL DISTRICT': ' UFSD',
-            ' CENTRAL SCHOOL DISTRICT': ' CSD',
-            ' CITY SCHOOL DISTRICT': ' CITY SD',
-            ' COMMON SCHOOL DISTRICT': ' COMN SD',
-            ' SCHOOL DISTRICT': ' SD'
-        }
-        for old, new in replacements.items():
-            name = name.replace(old, new)
-        return name
-    
-grad_all_students['lea_name_clean'] = grad_all_students['lea_name'].apply(standardize_district_name)
-master['ENTITY_NAME_clean'] = master['ENTITY_NAME'].apply(standardize_district_name)
-
-#create mapping from lea_name to graduation metrics
-grad_summary = grad_all_students.groupby('lea_name_clean').agg({
-    'grad_pct': 'mean',
-    'dropout_pct': 'mean',
-    'enroll_cnt': 'sum'
-}).reset_index()
-
-#merge with master (match on cleaned district)
-master = master.merge(
-    grad_summary,
-    left_on='ENTITY_NAME_clean',
-    right_on='lea_name_clean',
-    how='left'
-)
-master = master.drop(['lea_name_clean', 'ENTITY_NAME_clean'], axis=1)
-master = master.rename(columns={
-    'grad_pct': 'graduation_rate',
-    'dropout_pct': 'dropout_rate',
-    'enroll_cnt': 'cohort_size'
-})
-
-merged_count = master['graduation_rate'].notna().sum()
-print(f" Successfully merged graduation data for {merged_count}/{len(master)} records")
-
-print(f"\n Master dataset shape: {master.shape}")
-print(f" Columns: {master.columns.tolist()}")
-
-#saving the master dataset
-master.to_csv(OUTPUT_DIR / 'master_dataset.csv', index=False)
-
-#summary stats
-print("\n" +"="*70)
-print("PROCESSING COMPLETE!")
-print("="*70)
-print(f"\nOutput files saved to: {OUTPUT_DIR}")
-print("\nFiles created:")
-print(" 1. target_districts.csv - District-county mapping")
-print(" 2. enrollment_filtered.csv - Enrollment by grade")
-print(" 3. demographics_filtered.csv - Race/ethnicity demographics")
-print(" 4. *_filtered.csv - Various STUDED metrics")
-print(" 5. graduation_filtered.csv - Graduation data (all subgroups)")
-print(" 6. graduation_all_students.csv - Graduation data (all students only)")
-print(" 7. master_dataset.csv - Combined key metrics")
-
-print("\n" + "="*70)
-print("MASTER DATASET SUMMARY")
-print("="*70)
-print(f"\nTotal records: {len(master)}")
-print(f"\nRecords by county:")
-print(master['county'].value_counts())
-print(f"\nYears covered:")
-print(master['YEAR'].value_counts().sort_index())
-print(f"\nSample data:")
-print(master.head(10))
-
-print("\n" + "="*70)
-print('NEXT STEP: Build Streamlit dashboard using master_dataset.csv')
-print("="*70)
+    #load and filter graduation data
+    print("\n[6/7] Processing graduation data...")
+    grad_df = sources.get('grad')
+    if grad_df is not None:
+        #filter for target counties
+        grad_filtered = grad_df[
+            grad_df['county_name'].isin(counties) |
+            ((grad_df['nyc_ind'] == 1) & include_nyc)
+        ].copy()
+
+        pct_cols = ['grad_pct', 'dropout_pct', 'still_enr_pct', 'ged_pct',
+                    'local_pct', 'reg_pct', 'reg_adv_pct']
+
+        #keep the raw text so validation can report values that coercion turns into NaN
+        validation_inputs['grad_pct_raw'] = grad_filtered[[c for c in pct_cols if c in grad_filtered.columns]].copy()
+        for col in pct_cols:
+            if col in grad_filtered.columns:
+                grad_filtered[col] = grad_filtered[col].astype(str).str.replace("%", "").str.strip()
+                grad_filtered[col] = pd.to_numeric(grad_filtered[col], errors='coerce')
+
+        #filter for "all students" subgroup for main metrics
+        grad_all_students = grad_filtered[grad_filtered['subgroup_name'] == 'All Students'].copy()
+        print(f" Filtered to {len(grad_filtered)} total graduation records")
+        print(f" 'All Students' records: {len(grad_all_students)}")
+
+        #save filtered graduation data
+        tables['grad_filtered.csv'] = grad_filtered
+        tables['graducation_all_students.csv'] = grad_all_students
+    else:
+        print(f" Graduation file not found")
+        grad_all_students = None
+
+    #creating master dataset by joining key metrics
+    print("\n[7/7] Creating master dataset...")
+
+    master = enrollment_filtered[['ENTITY_CD', 'ENTITY_NAME', 'YEAR', 'K12']].copy()
+    master = master.rename(columns={'K12': 'total_enrollment'})
+    if len(master) == 0:
+        raise EmptySelectionError(f"No enrollment records for counties {', '.join(counties)}"
+                                  f"{' and years ' + ', '.join(map(str, years)) if years else ''}; nothing to publish")
+
+    demo_cols = ['ENTITY_CD', 'YEAR', 'PER_ECDIS', 'PER_BLACK', 'PER_HISP',
+                'PER_WHITE', 'PER_ASIAN', 'PER_ELL', 'PER_SWD']
+    if all(col in demographics_filtered.columns for col in demo_cols):
+        master = master.merge(
+            demographics_filtered[demo_cols],
+            on=['ENTITY_CD', 'YEAR'],
+            how='left'
+        )
+    if 'lunch' in filtered_studed:
+        lunch = filtered_studed['lunch'][['ENTITY_CD', 'YEAR', 'PER_FREE_LUNCH', 'PER_REDUCED_LUNCH']]
+        master = master.merge(lunch, on=['ENTITY_CD', 'YEAR'], how='left')
+
+    if 'attendance' in filtered_studed:
+        attendance = filtered_studed['attendance'][['ENTITY_CD', 'YEAR', 'ATTENDANCE_RATE']]
+        master = master.merge(attendance, on=['ENTITY_CD', 'YEAR'], how='left')
+
+    if 'suspensions' in filtered_studed:
+        suspensions = filtered_studed['suspensions'][['ENTITY_CD', 'YEAR', 'PER_SUSPENSIONS']]
+        master = master.merge(suspensions, on=['ENTITY_CD', 'YEAR'], how='left')
+
+    #add county info from above mapping
+    entity_to_county = target_districts.set_index('DISTRICT_NAME')['COUNTY_NAME'].to_dict()
+    master['county'] = master['ENTITY_NAME'].map(entity_to_county)
+    master['county'] = master['county'].fillna('NYC')
+
+    #adding graduation data if available
+    if grad_all_students is not None:
+        #fuzzy match graduation LEA names onto master district names
+        grad_names = pd.DataFrame({
+            'name': grad_all_students['lea_name'],
+            'county': grad_all_students['county_name'].where(grad_all_students['nyc_ind'] != 1, 'NYC')
+        }).dropna(subset=['name'])
+        master_names = master[['ENTITY_NAME', 'county']].rename(columns={'ENTITY_NAME': 'name'})
+        if overrides_path is not None and not Path(overrides_path).exists():
+            print(f" No crosswalk overrides at {overrides_path}, using fuzzy matches only")
+
+        crosswalk = build_crosswalk(
+            grad_names,
+            master_names,
+            Path(output_dir) / CROSSWALK_NAME,
+            overrides_path=overrides_path,
+            save=False
+        )
+        #published with the run's other outputs, not ahead of validation
+        tables[CROSSWALK_NAME] = crosswalk
+        print(f" Crosswalk methods: {crosswalk['method'].value_counts().to_dict()}")
+
+        grad_all_students['matched_name'] = grad_all_students['lea_name'].map(
+            crosswalk.set_index('source_name')['matched_name']
+        )
+
+        #create mapping from matched district to graduation metrics
+        grad_summary = grad_all_students.groupby('matched_name').agg({
+            'grad_pct': 'mean',
+            'dropout_pct': 'mean',
+            'enroll_cnt': 'sum'
+        }).reset_index()
+
+        #merge with master (match on crosswalked district)
+        master = master.merge(
+            grad_summary,
+            left_on='ENTITY_NAME',
+            right_on='matched_name',
+            how='left'
+        )
+        master = master.drop('matched_name', axis=1)
+        master = master.rename(columns={
+            'grad_pct': 'graduation_rate',
+            'dropout_pct': 'dropout_rate',
+            'enroll_cnt': 'cohort_size'
+        })
+
+        merged_count = master['graduation_rate'].notna().sum()
+        print(f" Successfully merged graduation data for {merged_count}/{len(master)} records")
+
+    print(f"\n Master dataset shape: {master.shape}")
+    print(f" Columns: {master.columns.tolist()}")
+
+    tables[MASTER_NAME] = master
+    return tables, validation_inputs
+
+
+def validate_tables(tables, validation_inputs=None, output_dir=OUTPUT_DIR, write_report=True):
+    """ Validate every table in one pass before anything is published; returns (clean, quarantined, report)"""
+    print("\nValidating outputs...")
+    report_path = Path(output_dir) / 'validation_report.csv'
+    try:
+        clean, quarantined, report = run_validation({**tables, **(validation_inputs or {})})
+    except ValidationError as e:
+        #nothing has been staged yet, so the previous outputs stay live
+        if write_report:
+            write_csv_atomic(e.report, report_path)
+        raise
+    if write_report:
+        write_csv_atomic(report, report_path)
+    flagged = report[report['violations'] > 0]
+    skipped = report[report['status'] == 'skipped']
+    print(f" {len(report) - len(skipped)} checks, {len(flagged)} with violations, {len(skipped)} skipped")
+    for row in flagged.itertuples():
+        print(f" -{row.table} {row.rule}({row.columns}) [{row.policy}]: {row.violations}")
+    for row in skipped.itertuples():
+        print(f" -{row.table} {row.rule} skipped, missing {row.missing}")
+    clean = {name: table for name, table in clean.items() if name not in (validation_inputs or {})}
+    return clean, quarantined, report
+
+
+def build_aggregates(master, jobs=1, previous=None, groups=None):
+    """
+    Derived outputs the dashboard reads instead of recomputing, keyed by output name
+    With the previous run's aggregates and the (YEAR, county) groups that
+    changed since, the per-group ones only rebuild those groups
+    """
+    previous = previous or {}
+    builders = {}
+    for name, build in GROUPED_AGGREGATES.items():
+        if groups is not None and name in previous:
+            builders[name] = lambda build=build, name=name: patch_groups(previous[name], master, groups, build)
+        else:
+            builders[name] = lambda build=build: build(master)
+    #per-district time series for the dashboard's trend charts; a full build is already cheap
+    builders[TREND_STORE_NAME] = lambda: TrendStore.build(master)
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        futures = {name: pool.submit(build) for name, build in builders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def stage_outputs(staged, outputs):
+    """ Write tables as CSV or Parquet by name, and anything else through its own save()"""
+    for name, output in outputs.items():
+        if name.endswith('.parquet'):
+            write_parquet(output, staged.path(name))
+        elif isinstance(output, pd.DataFrame):
+            staged.write_csv(output, name)
+        else:
+            output.save(staged.path(name))
+
+
+def run(processed_dir=PROCESSED_DIR, output_dir=OUTPUT_DIR, counties=TARGET_COUNTIES, years=None,
+        jobs=1, dry_run=False, overrides_path=CROSSWALK_OVERRIDES):
+    """ Full refresh: filter, merge, validate, aggregate and publish one new data version"""
+    output_dir = Path(output_dir)
+    if not dry_run:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("="*70)
+    print("NYS EDUCATION DATA PROCESSING PIPELINE")
+    print("="*70)
+
+    sources = read_sources(processed_dir, jobs)
+    tables, validation_inputs = build_tables(sources, counties, years, output_dir, overrides_path)
+    tables, quarantined, report = validate_tables(tables, validation_inputs, output_dir, write_report=not dry_run)
+    #county, district and subgroup names as categoricals with one dictionary per kind of name
+    tables = encode_tables(tables)
+    master = tables[MASTER_NAME]
+    outputs = {**tables, **{f'quarantine_{name}': rows for name, rows in quarantined.items()}}
+    outputs.update({parquet_name(name): tables[name] for name in PARQUET_TABLES if name in tables})
+
+    #what changed since the published snapshot, keyed on (ENTITY_CD, YEAR)
+    print("\nComparing with the previous snapshot...")
+    #only keyed tables can be diffed; the per-group aggregates are read for patching
+    previous = read_previous(keyed_names(tables) + list(GROUPED_AGGREGATES), output_dir)
+    changes = diff_tables(previous, tables)
+    outputs[CHANGE_REPORT_NAME] = changes
+    if previous:
+        summary = summarize_changes(changes)
+        print(summary.to_string() if len(summary) > 0 else " No changes")
+    else:
+        print(" No previous snapshot, everything is new")
+
+    groups = affected_groups(previous.get(MASTER_NAME), master, changes, MASTER_NAME)
+    if groups is not None:
+        print(f" Rebuilding aggregates for {len(groups)} changed (YEAR, county) groups")
+    outputs.update(build_aggregates(master, jobs, previous, groups))
+
+    if dry_run:
+        print(f"\nDry run, nothing written. Would publish {len(outputs)} files to {output_dir}:")
+        for name in outputs:
+            print(f" -{name}")
+        return master
+
+    #staging every output, then commit: promote them together and publish a new data version
+    with StagedOutput(output_dir) as staged:
+        stage_outputs(staged, outputs)
+        manifest = staged.commit()
+    print(f" Published data version {manifest['version']}")
+
+    #summary stats
+    print("\n" +"="*70)
+    print("PROCESSING COMPLETE!")
+    print("="*70)
+    print(f"\nOutput files saved to: {output_dir}")
+    print("\nFiles created:")
+    print(" 1. target_districts.csv - District-county mapping")
+    print(" 2. enrollment_filtered.csv - Enrollment by grade")
+    print(" 3. demographics_filtered.csv - Race/ethnicity demographics")
+    print(" 4. *_filtered.csv - Various STUDED metrics")
+    print(" 5. graduation_filtered.csv - Graduation data (all subgroups)")
+    print(" 6. graduation_all_students.csv - Graduation data (all students only)")
+    print(" 7. master_dataset.csv - Combined key metrics (plus .parquet copies of master and graduation tables)")
+    print(" 8. district_crosswalk.csv - Graduation to master district name matches")
+    print(" 9. metrics_by_year_county.csv - Weighted metrics per year and county")
+    print(" 10. trend_store.npz - Per-district time series for trend charts")
+    print(" 11. equity_moments.csv - Pairwise metric moments for equity trend lines")
+    print(" 12. validation_report.csv - Data-quality checks (quarantine_*.csv for dropped rows)")
+    print(" 13. change_report.csv - Rows added, removed and changed since the previous run")
+
+    print("\n" + "="*70)
+    print("MASTER DATASET SUMMARY")
+    print("="*70)
+    print(f"\nTotal records: {len(master)}")
+    print(f"\nRecords by county:")
+    print(master['county'].value_counts())
+    print(f"\nYears covered:")
+    print(master['YEAR'].value_counts().sort_index())
+    print(f"\nSample data:")
+    print(master.head(10))
+
+    print("\n" + "="*70)
+    print('NEXT STEP: Build Streamlit dashboard using master_dataset.csv')
+    print("="*70)
+    return master
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,161 @@
+"""
+Data version stamping shared by the pipeline and the dashboard
+The pipeline publishes a manifest with a content hash and build time;
+the dashboard polls it and swaps in freshly loaded data when it changes
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+MANIFEST_NAME = 'manifest.json'
+PROCESSED_DIR = Path('data/processed')
+MASTER_FILE = 'master_dataset.csv'
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """ sha256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(output_dir, file_names, manifest_name=MANIFEST_NAME, hashes=None):
+    """ Publish a manifest for the given output files, hashing any not in `hashes`"""
+    output_dir = Path(output_dir)
+    hashes = hashes or {}
+    files = {name: hashes.get(name) or file_hash(output_dir / name) for name in sorted(file_names)}
+    combined = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+    manifest = {
+        'version': combined[:12],
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'files': files
+    }
+
+    #write then rename so readers never see a partial manifest
+    tmp_path = output_dir / f'.{manifest_name}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_dir / manifest_name)
+    return manifest
+
+
+def read_manifest(output_dir=PROCESSED_DIR, manifest_name=MANIFEST_NAME):
+    """ The published manifest, or None if the pipeline hasn't written one"""
+    path = Path(output_dir) / manifest_name
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def current_version(output_dir=PROCESSED_DIR):
+    """ Version of the published data, falling back to the master file's mtime and size"""
+    manifest = read_manifest(output_dir)
+    if manifest is not None:
+        return manifest['version']
+    stat = (Path(output_dir) / MASTER_FILE).stat()
+    return f'mtime-{stat.st_mtime_ns}-{stat.st_size}'
+
+
+class InconsistentSnapshotError(Exception):
+    """ A published file didn't match the manifest after retrying"""
+
+
+class VersionChangedError(Exception):
+    """ The data version asked for was replaced by a newer one before it could be read"""
+
+
+def read_published(name, output_dir=PROCESSED_DIR, retries=10, wait_seconds=0.2, version=None):
+    """
+    Bytes of a published output file, verified against the manifest
+    While a pipeline commit is promoting files the manifest can briefly lag
+    behind, so a mismatch is retried until both sides agree. With `version`
+    the bytes must belong to that data version, and VersionChangedError is
+    raised once a newer one has been published.
+    """
+    path = Path(output_dir) / name
+    for attempt in range(retries + 1):
+        manifest = read_manifest(output_dir)
+        if version is not None and manifest is not None and manifest['version'] != version:
+            raise VersionChangedError(f'{name}: data version {version} was replaced by {manifest["version"]}')
+        data = path.read_bytes()
+        if manifest is None or name not in manifest['files']:
+            return data
+        if hashlib.sha256(data).hexdigest() == manifest['files'][name]:
+            return data
+        if attempt < retries:
+            time.sleep(wait_seconds)
+    raise InconsistentSnapshotError(f'{name} does not match manifest version {manifest["version"]}')
+
+
+class VersionedLoader:
+    """
+    Holds the loaded data for the current version and reloads it in a
+    background thread when the version changes. Readers always get a
+    consistent (version, data) pair; the swap happens under a lock only
+    after the new data has fully loaded. load_fn(version) must load exactly
+    that version and raise VersionChangedError if it has been replaced, in
+    which case the newer version is loaded instead.
+    """
+
+    def __init__(self, load_fn, version_fn=current_version, poll_seconds=10, retries=5):
+        self._load_fn = load_fn
+        self._version_fn = version_fn
+        self._poll_seconds = poll_seconds
+        self._retries = retries
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._current = self._load(version_fn())
+
+        self._thread = threading.Thread(target=self._watch, name='data-version-watcher', daemon=True)
+        self._thread.start()
+
+    def get(self):
+        """ Current (version, data) pair"""
+        with self._lock:
+            return self._current
+
+    def refresh(self):
+        """ Reload if the published version changed; returns True when data was swapped"""
+        version = self._version_fn()
+        if version == self.get()[0]:
+            return False
+        version, data = self._load(version)
+        with self._lock:
+            self._current = (version, data)
+        logger.info('Loaded data version %s', version)
+        return True
+
+    def _load(self, version):
+        """ (version, data) for the given version, following it if a commit replaces it mid-load"""
+        for attempt in range(self._retries + 1):
+            try:
+                return version, self._load_fn(version)
+            except VersionChangedError:
+                if attempt == self._retries:
+                    raise
+                version = self._version_fn()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self._poll_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                #keep serving the old version if the new one can't be loaded
+                logger.exception('Failed to reload data, keeping version %s', self.get()[0])
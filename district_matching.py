@@ -0,0 +1,243 @@
+"""
+Fuzzy district name matching for cross-source joins
+Candidates are blocked by county and token prefix, then scored with
+hashed character-trigram cosine similarity in vectorized batches.
+Matches are cached in a persistent crosswalk with manual overrides.
+"""
+
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from atomic_io import write_csv_atomic
+
+MATCH_THRESHOLD = 0.6
+PREFIX_LEN = 3
+HASH_DIM = 1024
+BATCH_SIZE = 8192
+MAX_BLOCKS = 2
+
+#words too common in district names to be useful for blocking
+STOPWORDS = {
+    'UFSD', 'CSD', 'SD', 'CITY', 'COMN', 'SCHOOL', 'SCHOOLS', 'DISTRICT',
+    'CENTRAL', 'UNION', 'FREE', 'COMMON', 'PUBLIC', 'OF', 'THE', 'AT'
+}
+
+#counties that all belong to the NYC block
+NYC_COUNTIES = {'NYC', 'NEW YORK', 'KINGS', 'BRONX', 'QUEENS', 'RICHMOND'}
+
+CROSSWALK_COLUMNS = ['source_name', 'county', 'matched_name', 'score', 'method']
+
+
+def standardize_district_name(name):
+    """ Abbreviate common district suffixes so both sources use one spelling"""
+    if pd.isna(name):
+        return name
+    name = str(name).upper()
+    replacements = {
+        ' UNION FREE SCHOOL DISTRICT': ' UFSD',
+        ' CENTRAL SCHOOL DISTRICT': ' CSD',
+        ' CITY SCHOOL DISTRICT': ' CITY SD',
+        ' COMMON SCHOOL DISTRICT': ' COMN SD',
+        ' SCHOOL DISTRICT': ' SD'
+    }
+    for old, new in replacements.items():
+        name = name.replace(old, new)
+    return name
+
+
+def normalize_name(name):
+    """ Standardized name with punctuation removed and whitespace collapsed"""
+    name = standardize_district_name(name)
+    if pd.isna(name):
+        return ''
+    name = re.sub(r'[^A-Z0-9 ]', ' ', name)
+    return ' '.join(name.split())
+
+
+def county_block(county):
+    """ Blocking key for a county name, with the five boroughs folded into NYC"""
+    if pd.isna(county):
+        return None
+    county = str(county).upper().strip()
+    return 'NYC' if county in NYC_COUNTIES else county
+
+
+def _prefixes(normalized):
+    """ Token prefixes used as blocking keys"""
+    tokens = normalized.split()
+    informative = [t for t in tokens if t not in STOPWORDS] or tokens
+    return {t[:PREFIX_LEN] for t in informative}
+
+
+def _trigram_matrix(names):
+    """ L2-normalized hashed trigram vectors, one row per name"""
+    matrix = np.zeros((len(names), HASH_DIM), dtype=np.float32)
+    for row, name in enumerate(names):
+        padded = f'  {name} '
+        for i in range(len(padded) - 2):
+            matrix[row, zlib.crc32(padded[i:i + 3].encode()) % HASH_DIM] = 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _rarest_blocks(blocks):
+    """ Union of the smallest non-empty blocks, so generic tokens don't blow up the candidates"""
+    blocks = sorted((b for b in blocks if b), key=len)[:MAX_BLOCKS]
+    return set().union(*blocks)
+
+
+def _candidate_pairs(source_norm, source_blocks, target_norm, target_blocks):
+    """ (source, target) index pairs that share a county and a token prefix"""
+    by_county = {}
+    by_prefix = {}
+    for j, (name, county) in enumerate(zip(target_norm, target_blocks)):
+        for prefix in _prefixes(name):
+            by_county.setdefault((county, prefix), set()).add(j)
+            by_prefix.setdefault(prefix, set()).add(j)
+
+    src_idx, tgt_idx = [], []
+    for i, (name, county) in enumerate(zip(source_norm, source_blocks)):
+        prefixes = _prefixes(name)
+        candidates = set()
+        if county is not None:
+            candidates = _rarest_blocks([by_county.get((county, p), set()) for p in prefixes])
+        #fall back to prefix-only blocking when the county block is empty or unknown
+        if not candidates:
+            candidates = _rarest_blocks([by_prefix.get(p, set()) for p in prefixes])
+        src_idx.extend([i] * len(candidates))
+        tgt_idx.extend(candidates)
+    return np.array(src_idx, dtype=np.int64), np.array(tgt_idx, dtype=np.int64)
+
+
+def match_names(source, target, threshold=MATCH_THRESHOLD):
+    """
+    Match source names to target names
+    Both frames need 'name' and 'county' columns. Returns one row per source
+    name with the best target above the threshold (or NaN) and its score.
+    """
+    source = source[['name', 'county']].drop_duplicates('name').reset_index(drop=True)
+    target = target[['name', 'county']].drop_duplicates('name').reset_index(drop=True)
+
+    source_norm = [normalize_name(n) for n in source['name']]
+    target_norm = [normalize_name(n) for n in target['name']]
+    source_blocks = [county_block(c) for c in source['county']]
+    target_blocks = [county_block(c) for c in target['county']]
+
+    src_idx, tgt_idx = _candidate_pairs(source_norm, source_blocks, target_norm, target_blocks)
+    scores = np.empty(len(src_idx), dtype=np.float32)
+    if len(src_idx) > 0:
+        source_vecs = _trigram_matrix(source_norm)
+        target_vecs = _trigram_matrix(target_norm)
+        for start in range(0, len(src_idx), BATCH_SIZE):
+            stop = start + BATCH_SIZE
+            scores[start:stop] = np.einsum(
+                'ij,ij->i',
+                source_vecs[src_idx[start:stop]],
+                target_vecs[tgt_idx[start:stop]]
+            )
+
+    #best candidate per source name
+    best_score = np.full(len(source), np.nan, dtype=np.float64)
+    best_target = np.full(len(source), -1, dtype=np.int64)
+    if len(src_idx) > 0:
+        order = np.lexsort((-scores, src_idx))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = src_idx[order][1:] != src_idx[order][:-1]
+        winners = order[first]
+        best_score[src_idx[winners]] = scores[winners]
+        best_target[src_idx[winners]] = tgt_idx[winners]
+
+    exact = np.array([
+        t >= 0 and source_norm[i] == target_norm[t] for i, t in enumerate(best_target)
+    ], dtype=bool)
+    accepted = (best_target >= 0) & (best_score >= threshold)
+    #index targets only where a match was accepted, so an empty target list leaves everything unmatched
+    matched = np.full(len(source), np.nan, dtype=object)
+    matched[accepted] = target['name'].to_numpy(dtype=object)[best_target[accepted]]
+
+    return pd.DataFrame({
+        'source_name': source['name'],
+        'county': source['county'],
+        'matched_name': matched,
+        'score': np.round(best_score, 4),
+        'method': np.where(exact, 'exact', np.where(accepted, 'fuzzy', 'unmatched'))
+    })
+
+
+def load_crosswalk(path):
+    """ Load a saved crosswalk, or an empty one if it doesn't exist yet"""
+    path = Path(path)
+    if path.exists():
+        return pd.read_csv(path)
+    return pd.DataFrame(columns=CROSSWALK_COLUMNS)
+
+
+def load_overrides(path):
+    """ Manual source_name -> matched_name overrides"""
+    path = Path(path) if path is not None else None
+    if path is None or not path.exists():
+        return {}
+    overrides = pd.read_csv(path)
+    return overrides.set_index('source_name')['matched_name'].to_dict()
+
+
+def resolve_conflicts(crosswalk):
+    """
+    Keep one fuzzy match per target name
+    A fuzzy match loses its target to any exact or override match of the
+    same target, and otherwise to the highest-scoring fuzzy match. Losers
+    are marked 'ambiguous' with no match, so they surface for a manual
+    override instead of merging two districts' data.
+    """
+    crosswalk = crosswalk.copy()
+    fuzzy = crosswalk['method'] == 'fuzzy'
+    pinned = crosswalk['method'].isin(['exact', 'override'])
+    taken = set(crosswalk.loc[pinned, 'matched_name'].dropna())
+
+    ranked = crosswalk[fuzzy].sort_values(['matched_name', 'score', 'source_name'], ascending=[True, False, True])
+    losers = ranked.index[ranked['matched_name'].isin(taken) | ranked.duplicated('matched_name')]
+    crosswalk.loc[losers, 'matched_name'] = np.nan
+    crosswalk.loc[losers, 'method'] = 'ambiguous'
+    return crosswalk
+
+
+def build_crosswalk(source, target, crosswalk_path, overrides_path=None, threshold=MATCH_THRESHOLD, save=True):
+    """
+    Update the persistent crosswalk for the given source and target names
+    Cached matches are reused while their target still exists, so only new or
+    previously unmatched names are scored. Overrides always win, and each
+    target keeps at most one fuzzy match (see resolve_conflicts). With
+    save=False the crosswalk is only returned, for dry runs.
+    """
+    cached = load_crosswalk(crosswalk_path)
+    target_names = set(target['name'].dropna())
+    reusable = cached[
+        cached['method'].isin(['exact', 'fuzzy']) &
+        cached['matched_name'].isin(target_names) &
+        cached['source_name'].isin(source['name'])
+    ]
+
+    todo = source[~source['name'].isin(reusable['source_name'])]
+    if len(todo) > 0:
+        fresh = match_names(todo, target, threshold=threshold)
+        crosswalk = pd.concat([reusable, fresh], ignore_index=True)
+    else:
+        crosswalk = reusable.reset_index(drop=True)
+
+    overrides = load_overrides(overrides_path)
+    if overrides:
+        has_override = crosswalk['source_name'].isin(overrides.keys())
+        crosswalk.loc[has_override, 'matched_name'] = crosswalk.loc[has_override, 'source_name'].map(overrides)
+        crosswalk.loc[has_override, 'score'] = 1.0
+        crosswalk.loc[has_override, 'method'] = 'override'
+    crosswalk = resolve_conflicts(crosswalk)
+
+    crosswalk = crosswalk[CROSSWALK_COLUMNS].sort_values('source_name').reset_index(drop=True)
+    if save:
+        Path(crosswalk_path).parent.mkdir(parents=True, exist_ok=True)
+        write_csv_atomic(crosswalk, crosswalk_path)
+    return crosswalk
@@ -0,0 +1,87 @@
+"""
+Equity statistics for the dashboard's scatter plots
+Pairwise sufficient statistics (n, sums, sums of squares and cross
+products) are precomputed per (YEAR, county) with matrix products, so
+correlations and OLS trend lines for any set of counties come from adding
+a few rows instead of refitting on the raw districts.
+"""
+
+import numpy as np
+import pandas as pd
+
+EQUITY_METRICS = ['PER_ECDIS', 'PER_FREE_LUNCH', 'ATTENDANCE_RATE', 'PER_SUSPENSIONS',
+                  'graduation_rate', 'dropout_rate', 'PER_ELL', 'PER_SWD']
+GROUP_KEYS = ['YEAR', 'county']
+MOMENT_COLUMNS = ['n', 'sum_x', 'sum_y', 'sum_xx', 'sum_yy', 'sum_xy']
+OUTLIER_Z = 2.0
+MOMENTS_NAME = 'equity_moments.csv'
+
+
+def _group_moments(values):
+    """ Pairwise-complete moment matrices for one group; entry [i, j] treats metric i as x and j as y"""
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    mask = present.astype(float)
+    n = mask.T @ mask
+    sum_x = filled.T @ mask
+    sum_xx = (filled ** 2).T @ mask
+    sum_xy = filled.T @ filled
+    return {'n': n, 'sum_x': sum_x, 'sum_y': sum_x.T, 'sum_xx': sum_xx, 'sum_yy': sum_xx.T, 'sum_xy': sum_xy}
+
+
+def build_pair_moments(df, metrics=EQUITY_METRICS, group_keys=GROUP_KEYS):
+    """ Long frame of (group keys, x, y) -> moments for every ordered metric pair"""
+    metrics = [m for m in metrics if m in df.columns]
+    xs, ys = np.meshgrid(np.arange(len(metrics)), np.arange(len(metrics)), indexing='ij')
+    off_diagonal = xs != ys
+    x_names = np.array(metrics)[xs[off_diagonal]]
+    y_names = np.array(metrics)[ys[off_diagonal]]
+
+    frames = []
+    for keys, group in df.groupby(group_keys, dropna=False, observed=True):
+        values = group[metrics].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        moments = _group_moments(values)
+        frame = pd.DataFrame({col: moments[col][off_diagonal] for col in MOMENT_COLUMNS})
+        frame.insert(0, 'y', y_names)
+        frame.insert(0, 'x', x_names)
+        for key, value in zip(reversed(group_keys), reversed(keys)):
+            frame.insert(0, key, value)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fit_selection(moments, year, counties):
+    """ Correlation and OLS fit (y on x) for every pair over one year and set of counties"""
+    selected = moments[(moments['YEAR'] == year) & moments['county'].isin(counties)]
+    sums = selected.groupby(['x', 'y'])[MOMENT_COLUMNS].sum()
+
+    n = sums['n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sxx = sums['sum_xx'] - sums['sum_x'] ** 2 / n
+        syy = sums['sum_yy'] - sums['sum_y'] ** 2 / n
+        sxy = sums['sum_xy'] - sums['sum_x'] * sums['sum_y'] / n
+        slope = sxy / sxx
+        intercept = sums['sum_y'] / n - slope * sums['sum_x'] / n
+        r = sxy / np.sqrt(sxx * syy)
+        resid_sd = np.sqrt((syy - slope * sxy).clip(lower=0) / (n - 2))
+
+    fits = pd.DataFrame({'n': n, 'slope': slope, 'intercept': intercept, 'r': r, 'resid_sd': resid_sd})
+    #a line needs at least three districts to say anything about residuals
+    return fits.where(n >= 3)
+
+
+def correlation_matrix(fits, metrics=EQUITY_METRICS):
+    """ Square correlation matrix from a fit_selection result"""
+    matrix = fits['r'].unstack('y').reindex(index=metrics, columns=metrics)
+    for metric in metrics:
+        matrix.loc[metric, metric] = 1.0
+    return matrix
+
+
+def flag_outliers(df, x, y, fit, z=OUTLIER_Z):
+    """ Label districts more than z residual SDs above or below the trend line"""
+    predicted = fit['intercept'] + fit['slope'] * df[x]
+    residual = df[y] - predicted
+    limit = z * fit['resid_sd']
+    labels = np.select([residual > limit, residual < -limit], ['Above trend', 'Below trend'], 'Near trend')
+    return df.assign(expected=predicted, residual=residual, vs_trend=labels)
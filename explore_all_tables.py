@@ -5,6 +5,8 @@ Quick script to explore all CSV tables and identify what we need
 import pandas as pd 
 from pathlib import Path 
 
+from schema_catalog import get_table_info
+
 PROCESSED_DIR = Path('data/processed')
 
 #get all csv files
@@ -16,9 +18,10 @@ print("="*70)
 
 for i, file in enumerate(csv_files, 1):
     print(f"\n{i}. {file.name}")
-    df = pd.read_csv(file, nrows=5)
-    print(f" Shape: {df.shape[0]} rows (showing first 5)")
-    print(f"  Columns: {', '.join(df.columns.tolist())}")
+    info = get_table_info(file)
+    columns = [c['name'] for c in info['columns']]
+    print(f" Shape: ({info['rows']}, {len(columns)})")
+    print(f"  Columns: {', '.join(columns)}")
 
 print("\n" + "="*70)
 print('DETAILED EXPLORATION OF KEY TABLES')
@@ -29,12 +32,14 @@ print("\n1. COUNTY INFORMATION")
 print("-"*70)
 boces_file = PROCESSED_DIR / 'ENROLL_BOCES_and_N_RC.csv'
 if boces_file.exists():
-    df = pd.read_csv(boces_file)
+    info = get_table_info(boces_file)
+    #only the mapping columns are needed for the district listing
+    df = pd.read_csv(boces_file, usecols=['DISTRICT_CD', 'DISTRICT_NAME', 'COUNTY_NAME'])
 
     #finding target counties
     target_counties = ['NEW YORK', 'WESTCHESTER', 'NASSAU', 'SUFFOLK']
     print(f"\nAll counties in dataset:")
-    print(df['COUNTY_NAME'].value_counts())
+    print(pd.Series(info['value_counts'].get('COUNTY_NAME', {}), name='count'))
 
     print(f"\nTarget counties districts:")
     for county in target_counties:
@@ -64,13 +69,17 @@ print("\n\n3. ENROLLMENT DATA STRUCTURE")
 print('='*70)
 enroll_bed = PROCESSED_DIR / 'ENROLL_BEDS_Day_Enrollment.csv'
 if enroll_bed.exists():
-    df = pd.read_csv(enroll_bed)
-    print(f"Shape: {df.shape}")
-    print(f"Columns: {df.columns.tolist()}")
+    info = get_table_info(enroll_bed)
+    columns = [c['name'] for c in info['columns']]
+    print(f"Shape: ({info['rows']}, {len(columns)})")
+    print(f"Columns: {columns}")
     print("\nSample NYC data:")
-    nyc = df[df['ENTITY_CD'] == 1]
-    if len(nyc) > 0:
-        print(nyc.head())
+    #stop at the first chunk with NYC rows instead of loading the whole table
+    for chunk in pd.read_csv(enroll_bed, chunksize=100_000):
+        nyc = chunk[chunk['ENTITY_CD'] == 1]
+        if len(nyc) > 0:
+            print(nyc.head())
+            break
 
 print("\n\n" + "="*70)
 print("SUMMARY: Tables We Need")
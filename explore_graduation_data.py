@@ -5,6 +5,8 @@ Quick exploration of graduation data
 import pandas as pd 
 from pathlib import Path 
 
+from schema_catalog import column_dtypes, get_table_info
+
 PROCESSED_DIR = Path('data/processed')
 
 print("="*70)
@@ -13,30 +15,35 @@ print("="*70)
 
 #load graduation data
 grad_file = PROCESSED_DIR / 'GRAD_GRAD_RATE_AND_OUTCOMES_2024.csv'
-grad_df = pd.read_csv(grad_file)
-
-print(f"\nShape: {grad_df.shape}")
-print(f"\nColumns ({len(grad_df.columns)}):")
-for i, col in enumerate(grad_df.columns, 1):
+#schema and stats come from the catalog; only a small sample is read from disk
+info = get_table_info(grad_file)
+dtypes = column_dtypes(info)
+columns = dtypes.index.tolist()
+value_counts = info['value_counts']
+grad_df = pd.read_csv(grad_file, nrows=1000, low_memory=False)
+
+print(f"\nShape: ({info['rows']}, {len(columns)})")
+print(f"\nColumns ({len(columns)}):")
+for i, col in enumerate(columns, 1):
     print(f" {i}. {col}")
 
 print(f"\nFirst 10 rows:")
 print(grad_df.head(10))
 
 print(f"\nData types:")
-print(grad_df.dtypes)
+print(dtypes)
 
 #look for entity/district identifiers
 print(f"\n" + "="*70)
 print("KEY IDENTIFIERS")
 print("="*70)
 
-if 'ENTITY_CD' in grad_df.columns:
-    print(f"\nUnique ENTITY_CD values: {grad_df['ENTITY_CD'].nunique()}")
+if 'ENTITY_CD' in columns:
+    print(f"\nUnique ENTITY_CD values: {info['distinct']['ENTITY_CD']}")
     print(f"Dample ENTITY_CD values:")
     print(grad_df['ENTITY_CD'].value_counts().head(10))
 
-if 'ENTITY_NAME' in grad_df.columns:
+if 'ENTITY_NAME' in columns:
     print("\nSample ENTITY_NAME values:")
     print(grad_df['ENTITY_NAME'].value_counts().head(10))
 
@@ -45,7 +52,7 @@ print(f"\n" + "="*70)
 print("GRADUATION METRICS")
 print("="*70)
 
-grad_cols = [col for col in grad_df.columns if 'GRAD' in col.upper() or 'RATE' in col.upper()]
+grad_cols = [col for col in columns if 'GRAD' in col.upper() or 'RATE' in col.upper()]
 print("\nColumns related to graduation rates:")
 for col in grad_cols:
     print(f" - {col}")
@@ -53,7 +60,7 @@ for col in grad_cols:
         print(f" Sample values: {grad_df[col].dropna().head(5).tolist()}")
 
 #look for cohort information
-cohort_cols = [col for col in grad_df.columns if 'COHORT' in col.upper()]
+cohort_cols = [col for col in columns if 'COHORT' in col.upper()]
 if cohort_cols:
     print("\nCohort columns:")
     for col in cohort_cols:
@@ -65,14 +72,17 @@ print("DEMOGRAPHIC SUBGROUPS")
 print("="*70)
 
 subgroup_indicators = ['SUBGROUP', 'DEMOGRAPHICS', 'RACE', 'ETHNICITY', 'DISABILITY', 'ELL']
-subgroup_cols = [col for col in grad_df.columns if any(ind in col.upper() for ind in subgroup_indicators)]
+subgroup_cols = [col for col in columns if any(ind in col.upper() for ind in subgroup_indicators)]
 
 if subgroup_cols:
     print(f"\nSubgroup columns found:")
     for col in subgroup_cols:
         print(f" - {col}")
-        if grad_df[col].dtype == 'object':
-            print(f" Unique values: {grad_df[col].nunique()}")
+        if col in info['distinct']:
+            print(f" Unique values: {info['distinct'][col]}")
+            top = dict(list(value_counts.get(col, {}).items())[:3])
+            print(f" Sample: {top}")
+        elif dtypes[col] == 'object':
             print(f" Sample: {grad_df[col].value_counts().head(3).to_dict()}")
 
 #check for nyc and target counties
@@ -80,8 +90,9 @@ print(f"\n" + "="*70)
 print("TARGET REGIONS")
 print("="*70)
 
-if 'ENTITY_NAME' in grad_df.columns:
-    nyc = grad_df[grad_df['ENTITY_NAME'].str.contains('NYC|NEW YORK CITY', case=False, na=False)]
+if 'ENTITY_NAME' in columns:
+    names = pd.read_csv(grad_file, usecols=['ENTITY_CD', 'ENTITY_NAME'])
+    nyc = names[names['ENTITY_NAME'].str.contains('NYC|NEW YORK CITY', case=False, na=False)]
     print(f"\nNYC records: {len(nyc)}")
     if len(nyc) > 0:
         print(nyc[['ENTITY_CD', 'ENTITY_NAME']].head())
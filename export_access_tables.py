@@ -3,80 +3,111 @@ Export all tables from access databases to CSV files
 Making them easier to work with in pandas
 """
 
-import subprocess
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path 
 
+from access_readers import open_reader
+from atomic_io import StagedOutput
+from schema_catalog import CATALOG_NAME, load_catalog, profile_csv, save_catalog
+
 DATA_DIR = Path('data/raw')
 PROCESSED_DIR = Path('data/processed')
-PROCESSED_DIR.mkdir(exist_ok=True)
+#(file name, prefix for its exported tables)
+DATABASES = [
+    ('ENROLL2024_20241105.accdb', 'ENROLL'),
+    ('STUDED_2024.accdb', 'STUDED'),
+    ('2024_GRADUATION_RATE.mdb', 'GRAD')
+]
+
+#'auto' uses mdb-tools when it's installed and access-parser otherwise
+ACCESS_BACKEND = os.environ.get('ACCESS_BACKEND', 'auto')
 
-def list_tables(db_path):
+def list_tables(reader):
     """ List all tables in an Access database"""
     try:
-        cmd = f'mdb-tables -1 "{str(db_path)}"'
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        tables = [t.strip() for t in result.stdout.strip().split('\n') if t.strip()]
-        return tables
+        return reader.list_tables()
     except Exception as e:
         print(f"Error listing tables: {e}")
         return []
 
-def export_table(db_path, table_name, output_path):
-    """ Export a single table to CSV"""
+def export_table(reader, table_name, output_path):
+    """ Write a single table to CSV exactly as the backend exports it, then profile the file"""
     try:
-        cmd = f'mdb-export "{str(db_path)}" "{table_name}" > "{str(output_path)}"'
-        subprocess.run(cmd, shell=True, check=True)
-        print(f"{table_name} -> {output_path.name}")
-        return True
+        reader.export_csv(table_name, output_path)
+        #profiling reads the file separately, so its type inference never touches the export
+        entry = profile_csv(output_path)
+        print(f"{table_name} -> {output_path.name} ({entry['rows']} rows)")
+        return entry
     except Exception as e:
         print(f"Failed to export {table_name}: {e}")
-        return False 
+        Path(output_path).unlink(missing_ok=True)
+        return None
 
-def export_all_tables(db_path, prefix):
-    """ Export all tables from a database"""
+def export_all_tables(db_path, prefix, staged, catalog, backend=ACCESS_BACKEND):
+    """ Export all tables from a database, profiling each one into the catalog"""
     print(f"\n{'='*60}")
     print(f"Processing: {db_path.name}")
     print('='*60)
-    tables = list_tables(db_path)
-    print(f"Found {len(tables)} tables: {tables}\n")
 
-    for table in tables:
-        clean_name = table.replace(' ', '_').replace('/', '_').replace('&', 'and')
-        output_file = PROCESSED_DIR / f"{prefix}_{clean_name}.csv"
-        export_table(db_path, table, output_file)
+    failed = []
+    #open the database once and stream every table through the same reader
+    with open_reader(db_path, backend) as reader:
+        tables = list_tables(reader)
+        print(f"Found {len(tables)} tables ({reader.name}): {tables}\n")
 
-#export from both databases
-if __name__ == '__main__':
+        for table in tables:
+            clean_name = table.replace(' ', '_').replace('/', '_').replace('&', 'and')
+            output_file = staged.path(f"{prefix}_{clean_name}.csv")
+            entry = export_table(reader, table, output_file)
+            if entry is not None:
+                catalog[output_file.name] = entry
+            else:
+                failed.append(table)
+    return failed
+
+def run(raw_dir=DATA_DIR, processed_dir=PROCESSED_DIR, backend=ACCESS_BACKEND, jobs=1, dry_run=False):
+    """ Export every database in DATABASES; returns the tables that failed"""
+    raw_dir, processed_dir = Path(raw_dir), Path(processed_dir)
     print("Exporting Access database tables to CSV...")
 
+    db_paths = []
+    for file_name, prefix in DATABASES:
+        db_path = raw_dir / file_name
+        if db_path.exists():
+            db_paths.append((db_path, prefix))
+        else:
+            print(f"Not found: {db_path}")
 
-    #enrollment database
-    enroll_db = DATA_DIR  / 'ENROLL2024_20241105.accdb'
-    if enroll_db.exists():
-        export_all_tables(enroll_db, 'ENROLL')
-    else:
-        print(f"Not found: {enroll_db}")
-    
-    #student/district database
-    studed_db = DATA_DIR / 'STUDED_2024.accdb'
-    if studed_db.exists():
-        export_all_tables(studed_db, 'STUDED')
-    else:
-        print(f"Not found: {studed_db}")
+    if dry_run:
+        for db_path, prefix in db_paths:
+            with open_reader(db_path, backend) as reader:
+                tables = list_tables(reader)
+            print(f"{db_path.name}: would export {len(tables)} tables as {prefix}_*.csv to {processed_dir}")
+        return []
+
+    #exports are staged and promoted together once every database is done
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    staged = StagedOutput(processed_dir, manifest_name='export_manifest.json')
+    catalog = load_catalog(processed_dir)
+
+    #each database gets its own reader, so they can export side by side
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        results = pool.map(lambda item: export_all_tables(item[0], item[1], staged, catalog, backend), db_paths)
+        failed = [table for result in results for table in result]
 
-    #graduation database
-    grad_db = DATA_DIR / '2024_GRADUATION_RATE.mdb'
-    if grad_db.exists():
-        export_all_tables(grad_db, 'GRAD')
+    if failed:
+        #keep the previous export intact rather than mixing versions
+        staged.abort()
+        print(f"\n{len(failed)} tables failed, nothing was replaced: {failed}")
     else:
-        print(f"Not Found: {grad_db}")
+        save_catalog(catalog, staged.path(CATALOG_NAME))
+        staged.commit()
 
-    print(f"\n{'='*60}")
-    print("Done! All tables exported to:" ,PROCESSED_DIR)
-    print('='*60)
\ No newline at end of file
+        print(f"\n{'='*60}")
+        print("Done! All tables exported to:" ,processed_dir)
+        print('='*60)
+    return failed
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,156 @@
+"""
+Headless load test for the Streamlit dashboard
+Drives app.py with Streamlit's AppTest: N concurrent sessions each change
+the year, counties, comparison and trend districts at random and time every
+rerun. Reports rerun latency percentiles plus CPU and memory.
+
+By default every session is its own process, which gives per-session CPU
+and peak RSS (each process also holds its own data cache, like a replica).
+--threads runs all sessions in one process sharing caches, like a single
+server; CPU and memory are then reported for the process as a whole.
+"""
+
+import argparse
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = Path(__file__).resolve().parent / 'app.py'
+PERCENTILES = [50, 90, 95, 99]
+ACTIONS = ['year', 'counties', 'compare_districts', 'trend_districts', 'aggregation']
+
+
+def _max_rss_mb():
+    #ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _random_action(at, rng):
+    """ Change one widget at random, the way a viewer would"""
+    action = rng.choice(ACTIONS)
+    if action == 'year':
+        widget = at.selectbox(key='year')
+        widget.set_value(rng.choice(widget.options))
+    elif action == 'aggregation':
+        widget = at.radio(key='aggregation')
+        widget.set_value(rng.choice(widget.options))
+    else:
+        widget = at.multiselect(key=action)
+        options = list(widget.options)
+        if not options:
+            return action
+        k = rng.randint(1, min(4, len(options)))
+        widget.set_value(rng.sample(options, k))
+    return action
+
+
+def run_session(session_id, reruns, seed, app_path=APP_PATH, timeout=120):
+    """ One simulated viewer: initial load followed by random interactions"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + session_id)
+    cpu_start = _cpu_seconds()
+    records = []
+
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    records.append({'session': session_id, 'action': 'initial', 'seconds': time.perf_counter() - start,
+                    'errors': len(at.exception)})
+
+    for _ in range(reruns):
+        action = _random_action(at, rng)
+        start = time.perf_counter()
+        at.run()
+        records.append({'session': session_id, 'action': action, 'seconds': time.perf_counter() - start,
+                        'errors': len(at.exception)})
+
+    return {
+        'records': records,
+        'cpu_seconds': _cpu_seconds() - cpu_start,
+        'max_rss_mb': _max_rss_mb()
+    }
+
+
+def summarize(latencies):
+    """ Latency percentiles (ms) for a set of reruns"""
+    seconds = latencies['seconds'].to_numpy()
+    summary = {f'p{p}': np.percentile(seconds, p) * 1000 for p in PERCENTILES}
+    summary['mean'] = seconds.mean() * 1000
+    summary['reruns'] = len(seconds)
+    return summary
+
+
+def run(sessions, reruns, seed=0, threads=False, app_path=APP_PATH):
+    """ Run the load test; returns (per-rerun latencies, per-session resources)"""
+    if threads:
+        cpu_start = _cpu_seconds()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            results = list(pool.map(run_session, range(sessions), [reruns] * sessions,
+                                    [seed] * sessions, [app_path] * sessions))
+        #thread sessions share one process, so resources are process-wide
+        for result in results:
+            result['cpu_seconds'] = (_cpu_seconds() - cpu_start) / sessions
+            result['max_rss_mb'] = _max_rss_mb()
+    else:
+        with ProcessPoolExecutor(max_workers=sessions) as pool:
+            results = list(pool.map(run_session, range(sessions), [reruns] * sessions,
+                                    [seed] * sessions, [app_path] * sessions))
+
+    latencies = pd.DataFrame([r for result in results for r in result['records']])
+    resources = pd.DataFrame([
+        {'session': i, 'cpu_seconds': r['cpu_seconds'], 'max_rss_mb': r['max_rss_mb']}
+        for i, r in enumerate(results)
+    ])
+    return latencies, resources
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=4, help='concurrent simulated viewers')
+    parser.add_argument('--reruns', type=int, default=20, help='interactions per session')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', action='store_true', help='run sessions as threads in one process')
+    parser.add_argument('--app', type=Path, default=APP_PATH)
+    parser.add_argument('--output', type=Path, help='write per-rerun latencies to this CSV')
+    args = parser.parse_args()
+
+    print("="*70)
+    print(f"DASHBOARD LOAD TEST: {args.sessions} sessions x {args.reruns} reruns "
+          f"({'threads' if args.threads else 'processes'})")
+    print("="*70)
+
+    wall_start = time.perf_counter()
+    latencies, resources = run(args.sessions, args.reruns, args.seed, args.threads, args.app)
+    wall = time.perf_counter() - wall_start
+
+    interactions = latencies[latencies['action'] != 'initial']
+    print("\nRerun latency (ms):")
+    print(pd.DataFrame({
+        'initial load': summarize(latencies[latencies['action'] == 'initial']),
+        'interactions': summarize(interactions)
+    }).round(1).T.to_string())
+
+    print("\nBy action (ms):")
+    print(interactions.groupby('action')['seconds'].describe(percentiles=[.5, .95])[['count', '50%', '95%', 'max']]
+          .mul([1, 1000, 1000, 1000]).round(1).to_string())
+
+    print("\nPer session:")
+    print(resources.round(2).to_string(index=False))
+
+    errors = int(latencies['errors'].sum())
+    print(f"\nThroughput: {len(latencies) / wall:.1f} reruns/sec over {wall:.1f}s, {errors} reruns with exceptions")
+
+    if args.output:
+        latencies.to_csv(args.output, index=False)
+        print(f"Latencies written to {args.output}")
@@ -0,0 +1,173 @@
+"""
+Command-line entry point for the data pipeline
+Runs any stage on its own so a refresh can redo just the part that changed:
+
+    python pipeline.py export                    # Access databases -> CSV
+    python pipeline.py process --years 2024      # filter, merge, validate, publish
+    python pipeline.py validate                  # re-check the published outputs
+    python pipeline.py build-aggregates          # rebuild cubes from the published master
+    python pipeline.py bench                     # compare Access reader backends
+
+Every stage takes --dry-run to report what it would do without writing.
+"""
+
+import argparse
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import data_processing
+import export_access_tables
+from access_readers import DEFAULT_BATCH_SIZE
+from atomic_io import StagedOutput
+from categorical import read_published_table
+from data_version import read_manifest, read_published
+from validation import ValidationError, rules_for
+
+
+def cmd_export(args):
+    failed = export_access_tables.run(args.raw_dir, args.processed_dir, args.backend, args.jobs, args.dry_run)
+    return 1 if failed else 0
+
+
+def _report_failure(e):
+    failed = e.report[(e.report['policy'] == 'fail') & (e.report['violations'] > 0)]
+    print(f" Validation failed:\n{failed.to_string(index=False)}")
+
+
+def cmd_process(args):
+    try:
+        data_processing.run(args.processed_dir, args.output_dir or args.processed_dir, args.counties,
+                            args.years, args.jobs, args.dry_run, args.overrides)
+    except ValidationError as e:
+        #nothing was staged, the previous data version is still published
+        _report_failure(e)
+        return 1
+    except data_processing.EmptySelectionError as e:
+        print(f" {e}")
+        return 1
+    return 0
+
+
+def _published_manifest(output_dir):
+    manifest = read_manifest(output_dir)
+    if manifest is None:
+        raise SystemExit(f"No published data in {output_dir}; run `pipeline.py process` first")
+    return manifest
+
+
+def cmd_validate(args):
+    """ Re-run the validation rules against the tables in the current data version"""
+    output_dir = args.output_dir or args.processed_dir
+    manifest = _published_manifest(output_dir)
+    names = [name for name in manifest['files'] if name.endswith('.csv') and rules_for(name)]
+    tables = {name: pd.read_csv(io.BytesIO(read_published(name, output_dir)), low_memory=False) for name in names}
+    print(f"Validating {len(tables)} tables from data version {manifest['version']}")
+    try:
+        data_processing.validate_tables(tables, output_dir=output_dir, write_report=not args.dry_run)
+    except ValidationError as e:
+        _report_failure(e)
+        return 1
+    return 0
+
+
+def cmd_build_aggregates(args):
+    """ Rebuild the derived outputs from the published master and publish them with the rest unchanged"""
+    output_dir = args.output_dir or args.processed_dir
+    manifest = _published_manifest(output_dir)
+    master = read_published_table(data_processing.MASTER_NAME, output_dir)
+    outputs = data_processing.build_aggregates(master, args.jobs)
+
+    if args.dry_run:
+        print(f"Dry run, nothing written. Would rebuild from data version {manifest['version']}:")
+        for name in outputs:
+            print(f" -{name}")
+        return 0
+
+    with StagedOutput(output_dir) as staged:
+        data_processing.stage_outputs(staged, outputs)
+        staged.keep(manifest['files'])
+        published = staged.commit()
+    print(f"Rebuilt {len(outputs)} aggregates, published data version {published['version']}")
+    return 0
+
+
+def cmd_bench(args):
+    import bench_access_readers
+
+    db_paths = args.databases or [args.raw_dir / name for name, _ in export_access_tables.DATABASES]
+    backends = args.backend or bench_access_readers.BENCH_BACKENDS
+    if args.dry_run:
+        for db_path in db_paths:
+            print(f"Would benchmark {db_path} with {', '.join(backends)}")
+        return 0
+    results = bench_access_readers.run(db_paths, backends, args.batch_size, args.max_tables)
+    if len(results) > 0:
+        print("\n" + results.to_string(index=False))
+    return 0
+
+
+def _options(*names):
+    """ Parent parser with just the shared options a subcommand uses"""
+    parser = argparse.ArgumentParser(add_help=False)
+    if 'raw-dir' in names:
+        parser.add_argument('--raw-dir', type=Path, default=data_processing.RAW_DIR,
+                            help='directory holding the Access databases')
+    if 'processed-dir' in names:
+        parser.add_argument('--processed-dir', type=Path, default=data_processing.PROCESSED_DIR,
+                            help='directory for exported CSVs')
+    if 'output-dir' in names:
+        parser.add_argument('--output-dir', type=Path, default=None,
+                            help='directory for published outputs (default: --processed-dir)')
+    if 'jobs' in names:
+        parser.add_argument('--jobs', '-j', type=int, default=1, help='files or databases to work on at once')
+    parser.add_argument('--dry-run', action='store_true', help='report what would happen without writing')
+    return parser
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export', parents=[_options('raw-dir', 'processed-dir', 'jobs')],
+                                   help='export Access tables to CSV')
+    export.add_argument('--backend', default=export_access_tables.ACCESS_BACKEND,
+                        choices=['auto', 'mdb-tools', 'access-parser'])
+    export.set_defaults(func=cmd_export)
+
+    process = subparsers.add_parser('process', parents=[_options('processed-dir', 'output-dir', 'jobs')],
+                                    help='build, validate and publish the outputs')
+    process.add_argument('--counties', nargs='+', default=data_processing.TARGET_COUNTIES,
+                         type=str.upper, help='counties to keep (NEW YORK brings in the NYC aggregate)')
+    process.add_argument('--years', nargs='+', type=int, default=None, help='school years to keep (default: all)')
+    process.add_argument('--overrides', type=Path, default=data_processing.CROSSWALK_OVERRIDES,
+                         help='CSV of manual district crosswalk corrections')
+    process.set_defaults(func=cmd_process)
+
+    validate = subparsers.add_parser('validate', parents=[_options('processed-dir', 'output-dir')],
+                                     help='validate the published outputs')
+    validate.set_defaults(func=cmd_validate)
+
+    aggregates = subparsers.add_parser('build-aggregates', parents=[_options('processed-dir', 'output-dir', 'jobs')],
+                                       help='rebuild cubes, trend store and equity moments')
+    aggregates.set_defaults(func=cmd_build_aggregates)
+
+    bench = subparsers.add_parser('bench', parents=[_options('raw-dir')], help='benchmark Access reader backends')
+    bench.add_argument('databases', nargs='*', type=Path)
+    bench.add_argument('--backend', action='append', choices=['mdb-tools', 'access-parser'],
+                       help='backend to benchmark (repeatable, default: all)')
+    bench.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    bench.add_argument('--max-tables', type=int, default=None)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Opt-in per-rerun profiling for the dashboard
+Enable with DASHBOARD_PROFILE=1 or the ?profile=1 query param; use
+'cprofile' instead of 1 to also capture a cProfile of one rerun per
+session (reload the page for another). Timings show up in a sidebar panel
+and are logged as one JSON line per rerun.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger('dashboard.profile')
+
+#session_state key holding the captured cProfile stats
+CPROFILE_STATS_KEY = '_rerun_cprofile_stats'
+
+#the cProfile currently enabled, so one left running by an interrupted rerun can be stopped
+_active_cprofile = None
+
+
+def _profile_logger():
+    """ The profile logger with its own INFO handler; Streamlit leaves the root logger at WARNING"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def profile_mode():
+    """ '', 'timing' or 'cprofile', from the query string or environment"""
+    value = st.query_params.get('profile') or os.environ.get('DASHBOARD_PROFILE', '')
+    value = str(value).lower()
+    if value in ('', '0', 'false', 'off'):
+        return ''
+    #cProfile captures a single rerun; later reruns in the session are only timed
+    if value == 'cprofile' and CPROFILE_STATS_KEY not in st.session_state:
+        return 'cprofile'
+    return 'timing'
+
+
+def _start_cprofile():
+    """ Enable a new cProfile, first stopping one a rerun Streamlit interrupted left running"""
+    global _active_cprofile
+    if _active_cprofile is not None:
+        _active_cprofile.disable()
+        _active_cprofile = None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        _profile_logger().warning('cProfile not captured: another profiler is active in this process')
+        return None
+    _active_cprofile = profiler
+    return profiler
+
+
+def _stop_cprofile(profiler):
+    global _active_cprofile
+    profiler.disable()
+    if _active_cprofile is profiler:
+        _active_cprofile = None
+
+
+class RerunProfiler:
+    """
+    Times the sections of one script rerun
+    begin() closes the previous section and opens the next, so the app
+    doesn't need re-indenting; chart() and dataframe() time individual
+    elements, including serialization, inside the current section.
+    """
+
+    def __init__(self, mode=''):
+        self.enabled = bool(mode)
+        self.timings = []
+        self._current = None
+        self._started = None
+        self._rerun_start = time.perf_counter()
+        self._cprofile = _start_cprofile() if mode == 'cprofile' else None
+
+    def begin(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._close(now)
+        self._current, self._started = name, now
+
+    def _close(self, now):
+        if self._current is not None:
+            self.timings.append({'section': self._current, 'element': '', 'ms': (now - self._started) * 1000})
+            self._current = None
+
+    def _timed(self, kind, name, fn, *args, **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.timings.append({
+            'section': self._current or '',
+            'element': f'{kind}: {name}',
+            'ms': (time.perf_counter() - start) * 1000
+        })
+        return result
+
+    def chart(self, fig, name, **kwargs):
+        """ st.plotly_chart, timed"""
+        return self._timed('chart', name, st.plotly_chart, fig, **kwargs)
+
+    def dataframe(self, df, name, **kwargs):
+        """ st.dataframe, timed"""
+        return self._timed('table', name, st.dataframe, df, **kwargs)
+
+    def finish(self):
+        """ Close the last section, log the rerun and render the sidebar panel"""
+        if not self.enabled:
+            return
+        self._close(time.perf_counter())
+        total_ms = (time.perf_counter() - self._rerun_start) * 1000
+        timings = pd.DataFrame(self.timings, columns=['section', 'element', 'ms'])
+
+        _profile_logger().info(json.dumps({
+            'event': 'rerun_profile',
+            'total_ms': round(total_ms, 1),
+            'timings': timings.round(1).to_dict(orient='records')
+        }))
+
+        if self._cprofile is not None:
+            _stop_cprofile(self._cprofile)
+            buffer = io.StringIO()
+            pstats.Stats(self._cprofile, stream=buffer).sort_stats('cumulative').print_stats(40)
+            #kept in the session so the download survives the reruns that follow
+            st.session_state[CPROFILE_STATS_KEY] = buffer.getvalue()
+        stats_text = st.session_state.get(CPROFILE_STATS_KEY)
+
+        with st.sidebar.expander(f"⏱️ Rerun profile ({total_ms:,.0f} ms)", expanded=True):
+            st.dataframe(timings.round(1), hide_index=True)
+            if stats_text is not None:
+                st.download_button('📥 Download cProfile stats', stats_text,
+                                   file_name='rerun_profile.txt', mime='text/plain')
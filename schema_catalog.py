@@ -0,0 +1,144 @@
+"""
+Schema and statistics catalog for exported tables
+Profiles each table once in a streaming pass (columns, dtypes, row and null
+counts, distinct counts for key columns) and persists the result so the
+exploration scripts don't have to reload whole CSVs
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATALOG_NAME = 'schema_catalog.json'
+PROCESSED_DIR = Path('data/processed')
+CHUNK_SIZE = 100_000
+SAMPLE_ROWS = 10
+
+#identifier and grouping columns worth tracking distinct values for
+KEY_COLUMNS = [
+    'ENTITY_CD', 'ENTITY_NAME', 'YEAR', 'DISTRICT_CD', 'DISTRICT_NAME', 'COUNTY_NAME',
+    'county_name', 'lea_name', 'nyc_ind', 'subgroup_name', 'aggregation_code'
+]
+
+#keep full value counts for key columns up to this many distinct values
+MAX_VALUE_COUNTS = 100
+
+
+def _merge_dtype(current, new):
+    """ dtype that holds values from both chunks"""
+    if current is None or current == new:
+        return new
+    if np.dtype(current).kind in 'biuf' and np.dtype(new).kind in 'biuf':
+        return str(np.result_type(current, new))
+    return 'object'
+
+
+def _dtype_name(dtype):
+    #pandas string dtypes don't round-trip through np.dtype, so treat them as object
+    return str(dtype) if isinstance(dtype, np.dtype) else 'object'
+
+
+def profile_chunks(chunks, key_columns=KEY_COLUMNS):
+    """ Profile a table from an iterable of DataFrame chunks in one pass"""
+    rows = 0
+    columns = None
+    dtypes = {}
+    nulls = None
+    value_counts = {}
+    sample = None
+
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns.tolist()
+            nulls = pd.Series(0, index=columns, dtype='int64')
+            sample = chunk.head(SAMPLE_ROWS)
+        rows += len(chunk)
+        nulls = nulls.add(chunk.isna().sum(), fill_value=0).astype('int64')
+        for col, dtype in chunk.dtypes.items():
+            dtypes[col] = _merge_dtype(dtypes.get(col), _dtype_name(dtype))
+        for col in key_columns:
+            if col in chunk.columns:
+                counts = chunk[col].value_counts(dropna=True)
+                counts.index = counts.index.astype(str)
+                value_counts[col] = counts if col not in value_counts else value_counts[col].add(counts, fill_value=0)
+
+    columns = columns or []
+    entry = {
+        'rows': rows,
+        'columns': [
+            {'name': col, 'dtype': dtypes.get(col, 'object'), 'nulls': int(nulls[col])}
+            for col in columns
+        ],
+        'distinct': {col: int(len(counts)) for col, counts in value_counts.items()},
+        'value_counts': {
+            col: {k: int(v) for k, v in counts.sort_values(ascending=False).items()}
+            for col, counts in value_counts.items() if len(counts) <= MAX_VALUE_COUNTS
+        },
+        'sample': [] if sample is None else json.loads(sample.to_json(orient='records')),
+        'profiled_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }
+    return entry
+
+
+def profile_csv(path, chunksize=CHUNK_SIZE, key_columns=KEY_COLUMNS):
+    """ Profile a CSV file without loading it all at once"""
+    path = Path(path)
+    chunks = pd.read_csv(path, chunksize=chunksize, low_memory=False)
+    return stamp_entry(profile_chunks(chunks, key_columns=key_columns), path)
+
+
+def stamp_entry(entry, path):
+    """ Record the file's size and mtime so stale entries can be detected"""
+    stat = Path(path).stat()
+    entry['size'] = stat.st_size
+    entry['mtime_ns'] = stat.st_mtime_ns
+    return entry
+
+
+def load_catalog(catalog_dir=PROCESSED_DIR):
+    path = Path(catalog_dir) / CATALOG_NAME
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_catalog(catalog, path):
+    """ Write the catalog via temp file and rename"""
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(catalog, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _is_current(entry, path):
+    stat = path.stat()
+    return entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+
+
+def get_table_info(path, catalog_dir=PROCESSED_DIR):
+    """
+    Catalog entry for a table file
+    Served straight from the catalog when it's current; otherwise the file is
+    profiled once and the catalog updated so later lookups are instant
+    """
+    path = Path(path)
+    catalog = load_catalog(catalog_dir)
+    entry = catalog.get(path.name)
+    if entry is not None and _is_current(entry, path):
+        return entry
+
+    entry = profile_csv(path)
+    catalog[path.name] = entry
+    save_catalog(catalog, Path(catalog_dir) / CATALOG_NAME)
+    return entry
+
+
+def column_dtypes(entry):
+    """ Column -> dtype name as a Series, like DataFrame.dtypes"""
+    return pd.Series({c['name']: c['dtype'] for c in entry['columns']}, dtype=object)
@@ -0,0 +1,101 @@
+"""
+Share the loaded master frame across dashboard processes
+The first worker to load a data version writes it as an Arrow IPC file in
+shared memory (/dev/shm when available); every worker then memory-maps that
+file, so numeric columns are backed by the same physical pages instead of a
+private copy per process. Needs pyarrow; without it callers fall back to a
+normal per-process load.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ENABLED = os.environ.get('DASHBOARD_SHARED_FRAME', '').lower() in ('1', 'true', 'on')
+KEEP_VERSIONS = 2
+
+
+def shared_dir():
+    """ Directory for the shared files, preferring RAM-backed /dev/shm"""
+    configured = os.environ.get('DASHBOARD_SHARED_DIR')
+    if configured:
+        path = Path(configured)
+    elif Path('/dev/shm').is_dir():
+        path = Path('/dev/shm') / 'nys-dashboard'
+    else:
+        path = Path(tempfile.gettempdir()) / 'nys-dashboard'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _frame_path(name, version, directory):
+    return directory / f'{name}-{version}.arrow'
+
+
+def _to_arrow(df):
+    """ Arrow table that keeps NaN as NaN so float columns can be mapped without a copy"""
+    import pyarrow as pa
+
+    arrays = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            arrays.append(pa.array(series.to_numpy(), from_pandas=False))
+        else:
+            arrays.append(pa.Array.from_pandas(series))
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def publish_frame(df, version, name='master', directory=None):
+    """ Write a frame for this version once; concurrent publishers are harmless"""
+    import pyarrow as pa
+
+    directory = directory or shared_dir()
+    path = _frame_path(name, version, directory)
+    if path.exists():
+        return path
+
+    table = _to_arrow(df)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with pa.OSFile(str(tmp_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    #drop old versions; processes still mapping them keep their pages until they let go
+    old = sorted(directory.glob(f'{name}-*.arrow'), key=lambda p: p.stat().st_mtime)
+    for stale in old[:-KEEP_VERSIONS]:
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def attach_frame(version, name='master', directory=None):
+    """ Memory-map a published frame, or None if this version isn't published yet"""
+    import pyarrow as pa
+
+    path = _frame_path(name, version, directory or shared_dir())
+    if not path.exists():
+        return None
+    source = pa.memory_map(str(path), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    #split_blocks keeps one block per column so numeric columns stay views onto the map
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def load_shared(version, load_fn, name='master'):
+    """ Attach to the shared copy of this version, publishing it first if needed"""
+    df = attach_frame(version, name)
+    if df is None:
+        publish_frame(load_fn(), version, name)
+        df = attach_frame(version, name)
+    return df
+
+
+def shared_columns(df):
+    """ Columns whose data lives in the shared mapping rather than process memory"""
+    return [col for col in df.columns
+            if isinstance(df[col].to_numpy(), np.ndarray) and not df[col].to_numpy().flags.writeable]
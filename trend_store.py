@@ -0,0 +1,106 @@
+"""
+Precomputed per-district time series for the "Trends Over Time" section
+Each metric is a contiguous (entity x year) array indexed by entity row and
+year offset, so pulling trends costs O(selected districts) instead of a scan
+of the full dataset. County baselines are stored alongside.
+"""
+
+import numpy as np
+import pandas as pd
+
+TREND_METRICS = ['ATTENDANCE_RATE', 'total_enrollment', 'graduation_rate', 'dropout_rate']
+STORE_NAME = 'trend_store.npz'
+
+
+class TrendStore:
+    """ Dense time-series arrays for every district, plus county averages"""
+
+    def __init__(self, entities, entity_counties, counties, years, values, baselines):
+        self.entities = np.asarray(entities)
+        self.entity_counties = np.asarray(entity_counties)
+        self.counties = np.asarray(counties)
+        self.years = np.asarray(years)
+        self.values = values
+        self.baselines = baselines
+        self._rows = {name: i for i, name in enumerate(self.entities)}
+        self._county_rows = {name: i for i, name in enumerate(self.counties)}
+
+    @classmethod
+    def build(cls, df, metrics=TREND_METRICS, entity_col='ENTITY_NAME', county_col='county'):
+        """ Build the store from a long (entity, YEAR) frame"""
+        df = df.dropna(subset=[entity_col, 'YEAR'])
+        entity_codes, entities = pd.factorize(df[entity_col], sort=True)
+        years = np.arange(df['YEAR'].min(), df['YEAR'].max() + 1)
+        offsets = (df['YEAR'].to_numpy() - years[0]).astype(np.int64)
+
+        #each entity's most recent county
+        latest = df.assign(_row=entity_codes).sort_values('YEAR').groupby('_row')[county_col].last()
+        entity_counties = latest.reindex(range(len(entities))).fillna('').astype(str).to_numpy()
+        county_codes, counties = pd.factorize(entity_counties, sort=True)
+
+        values = {}
+        baselines = {}
+        for metric in metrics:
+            if metric not in df.columns:
+                continue
+            grid = np.full((len(entities), len(years)), np.nan)
+            grid[entity_codes, offsets] = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+            values[metric] = grid
+
+            #district average per county and year, ignoring missing years
+            present = ~np.isnan(grid)
+            sums = np.zeros((len(counties), len(years)))
+            counts = np.zeros((len(counties), len(years)))
+            np.add.at(sums, county_codes, np.where(present, grid, 0.0))
+            np.add.at(counts, county_codes, present)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                baselines[metric] = sums / counts
+
+        return cls(entities.to_numpy(dtype=str), entity_counties, np.asarray(counties, dtype=str),
+                   years, values, baselines)
+
+    def save(self, path_or_file):
+        arrays = {
+            'entities': self.entities.astype(str),
+            'entity_counties': self.entity_counties.astype(str),
+            'counties': self.counties.astype(str),
+            'years': self.years
+        }
+        for metric, grid in self.values.items():
+            arrays[f'values__{metric}'] = grid
+            arrays[f'baseline__{metric}'] = self.baselines[metric]
+        np.savez(path_or_file, **arrays)
+
+    @classmethod
+    def load(cls, path_or_file):
+        with np.load(path_or_file, allow_pickle=False) as data:
+            values = {key.split('__', 1)[1]: data[key] for key in data.files if key.startswith('values__')}
+            baselines = {key.split('__', 1)[1]: data[key] for key in data.files if key.startswith('baseline__')}
+            return cls(data['entities'], data['entity_counties'], data['counties'], data['years'],
+                       values, baselines)
+
+    def _long(self, labels, grid, delta):
+        if delta:
+            #year-over-year change; the first year has nothing to compare against
+            grid = np.concatenate([np.full((len(grid), 1), np.nan), np.diff(grid, axis=1)], axis=1)
+        frame = pd.DataFrame({
+            'ENTITY_NAME': np.repeat(labels, len(self.years)),
+            'YEAR': np.tile(self.years, len(labels)),
+            'value': grid.ravel()
+        })
+        return frame.dropna(subset=['value'])
+
+    def series(self, names, metric, delta=False):
+        """ Long frame of (ENTITY_NAME, YEAR, value) for the selected districts"""
+        rows = [self._rows[name] for name in names if name in self._rows]
+        labels = self.entities[rows]
+        return self._long(labels, self.values[metric][rows], delta)
+
+    def counties_of(self, names):
+        return sorted({self.entity_counties[self._rows[name]] for name in names if name in self._rows})
+
+    def baseline(self, counties, metric, delta=False):
+        """ Long frame of county district-averages, labelled '<county> avg'"""
+        rows = [self._county_rows[c] for c in counties if c in self._county_rows]
+        labels = np.array([f'{c} avg' for c in self.counties[rows]])
+        return self._long(labels, self.baselines[metric][rows], delta)
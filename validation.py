@@ -0,0 +1,194 @@
+"""
+Data-quality validation stage for the pipeline
+Rules are declared per table and checked with vectorized masks, one pass
+over each table. Every rule carries a policy:
+  fail       - abort the run so the previous snapshot keeps being served
+  quarantine - drop the offending rows and keep them in a side file
+  warn       - report only
+"""
+
+from fnmatch import fnmatch
+
+import numpy as np
+import pandas as pd
+
+POLICIES = ['fail', 'quarantine', 'warn']
+
+PCT_COLUMNS = ['PER_ECDIS', 'PER_BLACK', 'PER_HISP', 'PER_WHITE', 'PER_ASIAN', 'PER_ELL',
+               'PER_SWD', 'PER_FREE_LUNCH', 'PER_REDUCED_LUNCH', 'PER_SUSPENSIONS',
+               'ATTENDANCE_RATE', 'graduation_rate', 'dropout_rate']
+RACE_COLUMNS = ['PER_WHITE', 'PER_BLACK', 'PER_HISP', 'PER_ASIAN']
+GRAD_PCT_COLUMNS = ['grad_pct', 'dropout_pct', 'still_enr_pct', 'ged_pct',
+                    'local_pct', 'reg_pct', 'reg_adv_pct']
+
+#values NYSED uses for suppressed or not-applicable cells
+SUPPRESSION_MARKERS = ['s', '-', '', '#', 'NA', 'N/A']
+
+#duplicate keys in the exports merged into the master on (ENTITY_CD, YEAR)
+KEY_RULE = {'rule': 'unique', 'columns': ['ENTITY_CD', 'YEAR'], 'policy': 'warn'}
+
+#table name (glob) -> rules
+RULES = {
+    'master_dataset.csv': [
+        {'rule': 'not_null', 'columns': ['ENTITY_CD', 'ENTITY_NAME', 'YEAR'], 'policy': 'fail'},
+        {'rule': 'unique', 'columns': ['ENTITY_CD', 'YEAR'], 'policy': 'fail'},
+        {'rule': 'numeric', 'columns': PCT_COLUMNS + ['total_enrollment', 'cohort_size'], 'policy': 'fail'},
+        {'rule': 'range', 'columns': PCT_COLUMNS, 'min': 0, 'max': 100, 'policy': 'quarantine'},
+        {'rule': 'range', 'columns': ['total_enrollment', 'cohort_size'], 'min': 0, 'policy': 'quarantine'},
+        #the four largest groups don't cover multiracial and other students, so allow some slack
+        {'rule': 'row_sum', 'columns': RACE_COLUMNS, 'min': 85, 'max': 102, 'policy': 'warn'}
+    ],
+    'enrollment_filtered.csv': [KEY_RULE],
+    'demographics_filtered.csv': [
+        KEY_RULE,
+        {'rule': 'range', 'columns': PCT_COLUMNS, 'min': 0, 'max': 100, 'policy': 'quarantine'}
+    ],
+    'attendance_filtered.csv': [KEY_RULE],
+    'lunch_filtered.csv': [KEY_RULE],
+    'suspensions_filtered.csv': [KEY_RULE],
+    #raw graduation percentages before coercion, so values silently turned into NaN show up
+    'grad_pct_raw': [
+        {'rule': 'numeric', 'columns': GRAD_PCT_COLUMNS, 'policy': 'warn'}
+    ],
+    'grad_filtered.csv': [
+        {'rule': 'range', 'columns': GRAD_PCT_COLUMNS, 'min': 0, 'max': 100, 'policy': 'quarantine'}
+    ]
+}
+
+#columns lists what was actually checked and missing what the table doesn't have;
+#a skipped rule checked nothing, which is not the same as 0 violations
+REPORT_COLUMNS = ['table', 'rule', 'columns', 'missing', 'policy', 'status', 'violations', 'sample_rows']
+
+
+class ValidationError(Exception):
+    """ Raised when a rule with the 'fail' policy has violations"""
+
+    def __init__(self, report):
+        self.report = report
+        failed = report[(report['policy'] == 'fail') & (report['violations'] > 0)]
+        summary = '; '.join(
+            f"{r.table} {r.rule}({r.columns}): {r.violations}" for r in failed.itertuples()
+        )
+        super().__init__(f"Validation failed: {summary}")
+
+
+def _parse_numbers(series):
+    """ (stripped text, parsed numbers) with '%' signs removed"""
+    text = series.astype(str).str.replace('%', '', regex=False).str.strip()
+    return text, pd.to_numeric(text, errors='coerce')
+
+
+def _numeric_mask(series):
+    """ Present values that don't parse as numbers and aren't suppression markers"""
+    if pd.api.types.is_numeric_dtype(series):
+        return np.zeros(len(series), dtype=bool)
+    text, parsed = _parse_numbers(series)
+    return (series.notna() & parsed.isna() & ~text.isin(SUPPRESSION_MARKERS)).to_numpy()
+
+
+def coerce_numeric(df, table_name, rules=RULES):
+    """ Columns under a 'numeric' rule as numbers, with suppression markers as NaN"""
+    columns = [col for rule in rules_for(table_name, rules) if rule['rule'] == 'numeric'
+               for col in rule['columns'] if col in df.columns]
+    converted = {col: _parse_numbers(df[col])[1] for col in dict.fromkeys(columns)
+                 if not pd.api.types.is_numeric_dtype(df[col])}
+    return df.assign(**converted) if converted else df
+
+
+def checked_columns(df, rule):
+    """ The rule's columns it can check on this table; unique and row_sum need all of them"""
+    columns = [col for col in rule['columns'] if col in df.columns]
+    if rule['rule'] in ('unique', 'row_sum') and len(columns) < len(rule['columns']):
+        return []
+    return columns
+
+
+def violation_mask(df, rule):
+    """ Boolean array marking rows that break a rule, checking only the columns the table has"""
+    columns = checked_columns(df, rule)
+    kind = rule['rule']
+    if not columns:
+        return np.zeros(len(df), dtype=bool)
+
+    if kind == 'not_null':
+        return df[columns].isna().any(axis=1).to_numpy()
+    if kind == 'unique':
+        return df.duplicated(columns, keep=False).to_numpy()
+    if kind == 'numeric':
+        return np.column_stack([_numeric_mask(df[col]) for col in columns]).any(axis=1)
+
+    values = df[columns].apply(pd.to_numeric, errors='coerce')
+    if kind == 'range':
+        mask = np.zeros(values.shape, dtype=bool)
+        if 'min' in rule:
+            mask |= (values < rule['min']).to_numpy()
+        if 'max' in rule:
+            mask |= (values > rule['max']).to_numpy()
+        return mask.any(axis=1)
+    if kind == 'row_sum':
+        #only rows where every column is present
+        totals = values.sum(axis=1, min_count=len(columns))
+        mask = totals.notna() & ((totals < rule.get('min', -np.inf)) | (totals > rule.get('max', np.inf)))
+        return mask.to_numpy()
+    raise ValueError(f"Unknown rule {kind!r}")
+
+
+def rules_for(table_name, rules=RULES):
+    return [rule for pattern, table_rules in rules.items() if fnmatch(table_name, pattern)
+            for rule in table_rules]
+
+
+def validate_table(df, table_name, rules=RULES):
+    """ Check one table against its rules; returns (report rows, quarantine mask, failed)"""
+    report = []
+    quarantine = np.zeros(len(df), dtype=bool)
+    failed = False
+    for rule in rules_for(table_name, rules):
+        if rule['policy'] not in POLICIES:
+            raise ValueError(f"Unknown policy {rule['policy']!r} for {table_name}")
+        mask = violation_mask(df, rule)
+        count = int(mask.sum())
+        columns = checked_columns(df, rule)
+        report.append({
+            'table': table_name,
+            'rule': rule['rule'],
+            'columns': ','.join(columns),
+            'missing': ','.join(col for col in rule['columns'] if col not in columns),
+            'policy': rule['policy'],
+            'status': 'checked' if columns else 'skipped',
+            'violations': count,
+            'sample_rows': ','.join(str(i) for i in df.index[mask][:5])
+        })
+        if count and rule['policy'] == 'quarantine':
+            quarantine |= mask
+        elif count and rule['policy'] == 'fail':
+            failed = True
+    return report, quarantine, failed
+
+
+def run_validation(tables, rules=RULES):
+    """
+    Validate every table in one pass
+    Returns (clean tables, quarantined rows per table, report). Raises
+    ValidationError if any 'fail' rule was violated. Clean tables come back
+    with their 'numeric' columns converted, so suppression markers that the
+    rule lets through are published as NaN rather than as text.
+    """
+    report = []
+    clean = {}
+    quarantined = {}
+    failed = False
+    for name, df in tables.items():
+        table_report, quarantine, table_failed = validate_table(df, name, rules)
+        report.extend(table_report)
+        failed |= table_failed
+        if quarantine.any():
+            quarantined[name] = df[quarantine]
+            clean[name] = coerce_numeric(df[~quarantine], name, rules)
+        else:
+            clean[name] = coerce_numeric(df, name, rules)
+
+    report = pd.DataFrame(report, columns=REPORT_COLUMNS)
+    if failed:
+        raise ValidationError(report)
+    return clean, quarantined, report